@@ -6,6 +6,9 @@ from ui.input_config import select_input_method
 from ui.chat import load_chat_history, handle_user_prompt
 
 from utils.session import session_initialization
+from utils.registry import collect_garbage
+from utils.uploads import sweep_spills
+from utils.chat_history import sweep_chat_histories
 
 
 st.set_page_config(
@@ -15,6 +18,15 @@ st.set_page_config(
     menu_items=None,
 )
 
+@st.cache_resource
+def cleanup_previous_runs():
+    """
+    Removes files left behind by earlier runs, once per process.
+    """
+    collect_garbage()
+    sweep_spills()
+    sweep_chat_histories()
+
 def main():
 
     col1, col2 = st.columns([0.5, 5])  # Adjust ratio as needed
@@ -50,7 +62,7 @@ def main():
             unsafe_allow_html=True,
         )
         sidebar()
-        if st.session_state.messages == []:
+        if len(st.session_state.messages) == 0:
             general_instructions()
         else:
             load_chat_history()
@@ -77,5 +89,6 @@ def main():
         select_input_method()
 
 if __name__ == "__main__":
+    cleanup_previous_runs()
     session_initialization()
     main()
\ No newline at end of file
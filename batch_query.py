@@ -0,0 +1,191 @@
+"""
+Headless batch-query mode: answers a JSONL file of questions against a corpus.
+
+    python batch_query.py corpus.json questions.jsonl --output answers.jsonl
+
+corpus.json lists the sources like the sidebar does:
+
+    {"files": ["data/report.pdf"], "youtube": [], "websites": ["https://example.com"], "crawl": []}
+
+Each line of questions.jsonl is {"id": ..., "question": ...}; the id defaults to the line number.
+Questions are retrieved in batches, with all questions of a batch embedded in one call, and
+answered with at most --concurrency generations in flight. Every answer is written as one
+JSON line as soon as it is ready, with its retrieval, generation and total latency.
+--fake uses the offline stand-ins of benchmarks/fakes.py instead of the Google models.
+"""
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+from itertools import islice
+from ragify import create_vectorstore, create_retriever, create_answer_chain, get_embedding_model, get_llm, VECTORSTORE_BACKENDS
+from utils.ingestion import iter_ingested_sources, file_source, url_source
+from utils.dedup import deduplicate_chunks
+from utils.constants import BATCH_QUERY_SIZE, BATCH_QUERY_CONCURRENCY, VECTORSTORE_BACKEND
+
+# Corpus spec keys and the ingestion source kind of their URLs
+URL_KINDS = {"youtube": "youtube", "websites": "website", "crawl": "crawl"}
+
+def corpus_sources(spec):
+    """
+    Returns the ingestion sources described by a corpus spec.
+    """
+    sources = [file_source(path) for path in spec.get("files", [])]
+    for key, kind in URL_KINDS.items():
+        sources += [url_source(kind, url) for url in spec.get(key, [])]
+    return sources
+
+def build_corpus(spec, persist_directory, embedding=None, backend=VECTORSTORE_BACKEND):
+    """
+    Chunks, deduplicates and embeds the sources of a corpus spec into a new vectorstore.
+    Each source is embedded as soon as it is chunked, so the chunks of the whole corpus
+    are never held at once. Returns the vectorstore and the sources that failed, as (source, exception).
+    """
+    failed = []
+
+    def chunks():
+        for source, source_chunks, error in iter_ingested_sources(corpus_sources(spec)):
+            if error is not None:
+                failed.append((source, error))
+                continue
+            kept, _ = deduplicate_chunks(source_chunks)
+            yield from kept
+
+    return create_vectorstore(chunks(), persist_directory, embedding=embedding, backend=backend), failed
+
+def read_questions(lines):
+    """
+    Yields {"id", "question"} for each non-empty JSON line.
+    """
+    for number, line in enumerate(lines, start=1):
+        if line.strip():
+            item = json.loads(line)
+            yield {"id": item.get("id", number), "question": item["question"]}
+
+def batched(items, size):
+    """
+    Yields lists of up to size items.
+    """
+    items = iter(items)
+    while batch := list(islice(items, size)):
+        yield batch
+
+async def answer_questions(retriever, answer_chain, questions, write, batch_size=BATCH_QUERY_SIZE, concurrency=BATCH_QUERY_CONCURRENCY):
+    """
+    Answers questions batch by batch and calls write(record) for each as soon as it is answered.
+
+    Retrieval of the next batch overlaps with the generations still running for the previous
+    one, and waiting for a free generation slot holds back retrieval, so at most one batch
+    of retrieved contexts is kept in memory. A failing question is written with its error.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    running = set()
+
+    async def generate(item, documents, started, retrieval_seconds):
+        start = time.perf_counter()
+        record = {"id": item["id"], "question": item["question"], "answer": None, "error": None}
+        try:
+            record["answer"] = await answer_chain.ainvoke({"input": item["question"], "context": documents})
+        except Exception as e:
+            record["error"] = f"{type(e).__name__}: {e}"
+        finally:
+            semaphore.release()
+
+        now = time.perf_counter()
+        record["sources"] = sorted({document.metadata.get("source") for document in documents if document.metadata.get("source")})
+        record["retrieval_seconds"] = retrieval_seconds
+        record["generation_seconds"] = now - start
+        record["latency_seconds"] = now - started
+        write(record)
+
+    for batch in batched(questions, batch_size):
+        started = time.perf_counter()
+        try:
+            contexts = await asyncio.to_thread(retriever.retrieve_batch, [item["question"] for item in batch])
+        except Exception as e:
+            for item in batch:
+                write({"id": item["id"], "question": item["question"], "answer": None, "error": f"{type(e).__name__}: {e}"})
+            continue
+        retrieval_seconds = time.perf_counter() - started
+
+        for item, documents in zip(batch, contexts):
+            await semaphore.acquire()
+            task = asyncio.create_task(generate(item, documents, started, retrieval_seconds))
+            running.add(task)
+            task.add_done_callback(running.discard)
+
+    await asyncio.gather(*running)
+
+def run_batch(vectorstore, questions, output, llm=None, batch_size=BATCH_QUERY_SIZE, concurrency=BATCH_QUERY_CONCURRENCY):
+    """
+    Answers questions against a vectorstore, streaming one JSON line per answer to output.
+    Returns a summary with the number of questions, errors, total seconds and latency percentiles.
+    """
+    latencies, written, errors = [], 0, 0
+    start = time.perf_counter()
+
+    def write(record):
+        nonlocal written, errors
+        output.write(json.dumps(record) + "\n")
+        output.flush()
+        written += 1
+        errors += record["error"] is not None
+        if "latency_seconds" in record:
+            latencies.append(record["latency_seconds"])
+
+    retriever = create_retriever(vectorstore)
+    asyncio.run(answer_questions(retriever, create_answer_chain(llm), questions, write, batch_size, concurrency))
+
+    seconds = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "questions": written,
+        "errors": errors,
+        "seconds": seconds,
+        "questions_per_second": written / seconds if seconds else 0.0,
+        "p50_latency": latencies[len(latencies) // 2] if latencies else None,
+        "p95_latency": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] if latencies else None,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Answer a JSONL file of questions against a corpus.")
+    parser.add_argument("corpus", help="JSON corpus spec with files, youtube, websites and crawl lists")
+    parser.add_argument("questions", help="JSONL file of {\"id\", \"question\"} objects, or - for stdin")
+    parser.add_argument("--output", default="-", help="JSONL file for the answers, or - for stdout")
+    parser.add_argument("--batch-size", type=int, default=BATCH_QUERY_SIZE, help="Questions retrieved per embedding call")
+    parser.add_argument("--concurrency", type=int, default=BATCH_QUERY_CONCURRENCY, help="Generations in flight at once")
+    parser.add_argument("--backend", choices=sorted(VECTORSTORE_BACKENDS), default=VECTORSTORE_BACKEND)
+    parser.add_argument("--persist-directory", help="Where to keep the vectorstore; a temporary directory by default")
+    parser.add_argument("--fake", action="store_true", help="Use the offline embedding and chat model stand-ins")
+    parser.add_argument("--fake-latency", type=float, default=0.0, help="Simulated latency of each fake model call in seconds")
+    args = parser.parse_args()
+
+    if args.fake:
+        from benchmarks.fakes import HashingEmbeddings, EchoChatModel
+        embedding, llm = HashingEmbeddings(latency=args.fake_latency), EchoChatModel(latency=args.fake_latency)
+    else:
+        embedding, llm = get_embedding_model(), get_llm()
+
+    with open(args.corpus, encoding="utf-8") as f:
+        spec = json.load(f)
+
+    with tempfile.TemporaryDirectory() as directory:
+        vectorstore, failed = build_corpus(spec, args.persist_directory or directory, embedding, args.backend)
+        for source, error in failed:
+            print(f"Failed to process {source['name']}: {error}", file=sys.stderr)
+
+        questions_file = sys.stdin if args.questions == "-" else open(args.questions, encoding="utf-8")
+        output = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+        try:
+            summary = run_batch(vectorstore, read_questions(questions_file), output, llm, args.batch_size, args.concurrency)
+        finally:
+            for f in (questions_file, output):
+                if f not in (sys.stdin, sys.stdout):
+                    f.close()
+
+    print(json.dumps(summary), file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""
+Local HTTP embedding server for exercising the batch embedding engine offline.
+
+    python -m benchmarks.fake_embedding_server --texts 2000 --fail-every 3
+
+starts the server and embeds synthetic texts through BatchEmbeddingEngine and the
+embedding cache, first without retries so throttled batches fail, then again with
+retries. It prints how many requests were throttled and retried and the highest request
+concurrency seen, and exits non-zero if the concurrency limit was exceeded, throttled
+requests were not retried or the rerun did not resume from the cached batches.
+"""
+import sys
+import json
+import time
+import argparse
+import tempfile
+import threading
+import urllib.error
+import urllib.request
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from langchain_core.embeddings import Embeddings
+from utils.embedding_engine import BatchEmbeddingEngine, EmbeddingBatchError
+from utils.embedding_cache import CachedEmbeddings
+from utils.constants import EMBEDDING_MAX_RETRIES
+from benchmarks.fakes import HashingEmbeddings
+from benchmarks.synthetic import sentences
+
+class FakeEmbeddingServer(ThreadingHTTPServer):
+    """
+    Serves POST /embed {"texts": [...]} -> {"vectors": [...]} with hashing embeddings.
+    Every fail_every-th request is answered with HTTP 429 to simulate rate limiting.
+    """
+
+    def __init__(self, address, fail_every=0, latency=0.0):
+        super().__init__(address, FakeEmbeddingHandler)
+        self.fail_every = fail_every
+        self.latency = latency
+        self.embeddings = HashingEmbeddings()
+        self.requests = 0
+        self.throttled = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+class FakeEmbeddingHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        server = self.server
+        with server.lock:
+            server.requests += 1
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+            throttle = server.fail_every and server.requests % server.fail_every == 0
+            if throttle:
+                server.throttled += 1
+
+        try:
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            time.sleep(server.latency)
+            if not throttle:
+                payload = json.dumps({"vectors": server.embeddings.embed_documents(body["texts"])}).encode()
+        finally:
+            # Before responding, since the client may send its next request as soon as it has the response
+            with server.lock:
+                server.in_flight -= 1
+
+        if throttle:
+            self.send_response(429)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+class RemoteEmbeddings(Embeddings):
+    """
+    Embedding client for the fake server.
+    """
+
+    def __init__(self, url):
+        self.url = url
+
+    def embed_documents(self, texts):
+        request = urllib.request.Request(
+            self.url, data=json.dumps({"texts": texts}).encode(), headers={"Content-Type": "application/json"}
+        )
+        with urllib.request.urlopen(request) as response:
+            return json.loads(response.read())["vectors"]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+@contextmanager
+def serve(fail_every=0, latency=0.0):
+    """
+    Runs the fake server on a free local port and yields it; its URL is server.url.
+    """
+    server = FakeEmbeddingServer(("127.0.0.1", 0), fail_every, latency)
+    server.url = f"http://127.0.0.1:{server.server_address[1]}/embed"
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+
+def run_engine(server, texts, cache_path, max_retries):
+    """
+    Embeds texts through BatchEmbeddingEngine and the embedding cache, as the app does, and
+    returns (engine, cache, vectors or None if some batches failed, seconds, sizes of the completed batches).
+    """
+    with server.lock:
+        server.requests = server.throttled = server.max_in_flight = 0
+    completed = []
+    engine = BatchEmbeddingEngine(RemoteEmbeddings(server.url), requests_per_second=50, max_retries=max_retries, backoff_seconds=0.05)
+    cache = CachedEmbeddings(engine, cache_path=cache_path)
+    engine.on_batch = lambda batch, vectors: (completed.append(len(batch)), cache.store_texts(batch, vectors))
+
+    start = time.perf_counter()
+    try:
+        vectors = cache.embed_documents(texts)
+    except EmbeddingBatchError:
+        vectors = None
+    return engine, cache, vectors, time.perf_counter() - start, completed
+
+def main():
+    parser = argparse.ArgumentParser(description="Exercise BatchEmbeddingEngine against a local fake embedding server.")
+    parser.add_argument("--texts", type=int, default=2000)
+    parser.add_argument("--fail-every", type=int, default=3, help="Throttle every n-th request with HTTP 429")
+    parser.add_argument("--latency", type=float, default=0.05, help="Server latency per request in seconds")
+    args = parser.parse_args()
+
+    texts = list(sentences(args.texts))
+    failures = []
+    with serve(args.fail_every, args.latency) as server, tempfile.TemporaryDirectory() as directory:
+        cache_path = f"{directory}/embedding_cache.sqlite3"
+
+        # Without retries every throttled batch fails, leaving a partially embedded run behind
+        engine, cache, vectors, seconds, batches = run_engine(server, texts, cache_path, max_retries=0)
+        stored = cache.stats()["entries"]
+        print(f"Run without retries: {len(batches)} batches embedded and cached, {engine.failed_batches} failed in {seconds:.2f}s")
+        if stored != sum(batches):
+            failures.append(f"{stored} texts were cached of the {sum(batches)} in completed batches")
+        if args.fail_every and (vectors is not None or not engine.failed_batches):
+            failures.append("the run without retries did not fail although requests were throttled")
+        if server.max_in_flight > engine.max_in_flight:
+            failures.append(f"{server.max_in_flight} concurrent requests exceed the limit of {engine.max_in_flight}")
+
+        engine, cache, vectors, seconds, batches = run_engine(server, texts, cache_path, max_retries=EMBEDDING_MAX_RETRIES)
+        stats = cache.stats()
+        print(f"Rerun: embedded {len(texts)} texts in {seconds:.2f}s over {len(batches)} batches, {stats['hits']} from the cache")
+        print(f"Requests: {server.requests}, throttled: {server.throttled}, retries: {engine.retries}")
+        print(f"Highest concurrency seen by the server: {server.max_in_flight} (limit {engine.max_in_flight})")
+        if vectors is None or len(vectors) != len(texts):
+            failures.append("the rerun did not embed every text")
+        if stats["hits"] != stored or stats["misses"] != len(set(texts)) - stored:
+            failures.append(f"the rerun embedded {stats['misses']} texts again instead of resuming from the {stored} cached ones")
+        if engine.retries != server.throttled or (args.fail_every and not engine.retries):
+            failures.append(f"{server.throttled} throttled requests were retried {engine.retries} times")
+        if server.max_in_flight > engine.max_in_flight:
+            failures.append(f"{server.max_in_flight} concurrent requests exceed the limit of {engine.max_in_flight}")
+    for failure in failures:
+        print(f"FAILED: {failure}")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
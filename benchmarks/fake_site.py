@@ -0,0 +1,166 @@
+"""
+Local HTTP website for exercising the crawler offline.
+
+    python -m benchmarks.fake_site --pages 30
+
+starts the site, crawls it twice through Crawler, changes one page in between and
+prints how many pages were fetched, how many the server answered with 304 Not Modified
+and how many requests robots.txt kept the crawler from making. It exits non-zero if a
+disallowed path was requested, the second crawl did not revalidate the unchanged pages
+with 304s or boilerplate was left in the extracted text.
+"""
+import sys
+import time
+import asyncio
+import hashlib
+import argparse
+import tempfile
+import threading
+from contextlib import contextmanager
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from utils.crawler import Crawler
+from benchmarks.synthetic import sentences
+
+class FakeSite(ThreadingHTTPServer):
+    """
+    Serves pages /page/0 ... /page/<n-1>, each linking to the next few pages and to a
+    /private page that robots.txt disallows. Every page has nav and footer boilerplate,
+    an ETag and a Last-Modified header, and answers conditional requests with 304.
+    """
+
+    def __init__(self, address, pages=30, links_per_page=3, latency=0.0):
+        super().__init__(address, FakeSiteHandler)
+        self.latency = latency
+        self.bodies = {}
+        self.modified = {}
+        texts = list(sentences(pages * 5, seed=3))
+        for i in range(pages):
+            links = "".join(f'<a href="/page/{(i + j) % pages}">Page {(i + j) % pages}</a>' for j in range(1, links_per_page + 1))
+            self.set_page(f"/page/{i}", f"Page {i}", " ".join(texts[i * 5:(i + 1) * 5]), links)
+        self.requests = []
+        self.not_modified = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    def set_page(self, path, title, text, links=""):
+        self.bodies[path] = (
+            f"<html><head><title>{title}</title></head><body>"
+            f'<nav><a href="/page/0">Home</a> <a href="/private">Admin</a> Site navigation</nav>'
+            f"<main><h1>{title}</h1><p>{text}</p>{links}</main>"
+            f"<footer>Copyright footer boilerplate</footer></body></html>"
+        ).encode()
+        self.modified[path] = formatdate(time.time(), usegmt=True)
+
+class FakeSiteHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests.append(self.path)
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+
+        try:
+            time.sleep(server.latency)
+            response = self._respond(server)
+        finally:
+            # Before responding, since the crawler may send its next request as soon as it has the response
+            with server.lock:
+                server.in_flight -= 1
+        self._send(*response)
+
+    def _respond(self, server):
+        """
+        Returns the (status, body, content type, headers) to answer the request with.
+        """
+        if self.path == "/robots.txt":
+            return 200, b"User-agent: *\nDisallow: /private\n", "text/plain"
+
+        body = server.bodies.get(self.path)
+        if body is None:
+            return 404, b"Not found", "text/plain"
+
+        etag = '"' + hashlib.sha256(body).hexdigest()[:16] + '"'
+        if self.headers.get("If-None-Match") == etag:
+            with server.lock:
+                server.not_modified += 1
+            return 304, b"", None
+        return 200, body, "text/html; charset=utf-8", {"ETag": etag, "Last-Modified": server.modified[self.path]}
+
+    def _send(self, status, body, content_type, headers=None):
+        self.send_response(status)
+        if content_type is not None:
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+@contextmanager
+def serve(pages=30, latency=0.0):
+    """
+    Runs the fake site on a free local port and yields it; its root URL is site.url.
+    """
+    site = FakeSite(("127.0.0.1", 0), pages, latency=latency)
+    site.url = f"http://127.0.0.1:{site.server_address[1]}"
+    thread = threading.Thread(target=site.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield site
+    finally:
+        site.shutdown()
+        site.server_close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Crawl a local fake website twice with the crawler.")
+    parser.add_argument("--pages", type=int, default=30)
+    parser.add_argument("--depth", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.02, help="Server latency per request in seconds")
+    args = parser.parse_args()
+
+    with serve(args.pages, args.latency) as site, tempfile.TemporaryDirectory() as directory:
+        crawler = Crawler(max_depth=args.depth, max_pages=args.pages, delay=0.0, cache_path=f"{directory}/crawl_cache.sqlite3")
+
+        crawls = {}
+        disallowed = 0
+        for run in ("first", "second"):
+            site.requests.clear()
+            site.not_modified = 0
+            start = time.perf_counter()
+            pages = asyncio.run(crawler.crawl(f"{site.url}/page/0"))
+            seconds = time.perf_counter() - start
+            changed = sum(page["changed"] for page in pages)
+            disallowed += sum(path.startswith("/private") for path in site.requests)
+            crawls[run] = {"pages": pages, "changed": changed, "not_modified": site.not_modified}
+            print(f"{run} crawl: {len(pages)} pages ({changed} changed) in {seconds:.2f}s, {len(site.requests)} requests")
+            site.set_page("/page/1", "Page 1", "This page was edited between crawls.")
+
+        second = crawls["second"]
+        boilerplate = any("footer boilerplate" in page["text"] or "Site navigation" in page["text"] for page in pages)
+        print(f"Not modified responses: {second['not_modified']}")
+        print(f"Requests to disallowed paths: {disallowed}")
+        print(f"Boilerplate in extracted text: {boilerplate}")
+        print(f"Highest concurrency seen by the server: {site.max_in_flight} (limit {crawler.per_host_concurrency})")
+
+        failures = []
+        if not crawls["first"]["pages"]:
+            failures.append("the first crawl found no pages")
+        if disallowed:
+            failures.append(f"{disallowed} requests went to paths robots.txt disallows")
+        if second["changed"] != 1 or second["not_modified"] != len(second["pages"]) - 1:
+            failures.append(f"the second crawl got {second['not_modified']} 304s for {len(second['pages'])} pages, one of them edited")
+        if boilerplate:
+            failures.append("boilerplate was left in the extracted text")
+        if site.max_in_flight > crawler.per_host_concurrency:
+            failures.append(f"{site.max_in_flight} concurrent requests exceed the limit of {crawler.per_host_concurrency}")
+    for failure in failures:
+        print(f"FAILED: {failure}")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+import time
+import hashlib
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import SimpleChatModel
+from utils.keyword_index import tokenize
+
+class HashingEmbeddings(Embeddings):
+    """
+    Deterministic, offline embedding stand-in. Tokens are hashed into buckets, so texts that
+    share words get similar vectors and retrieval results stay meaningful.
+    """
+
+    def __init__(self, size=256, latency=0.0):
+        self.size = size
+        self.latency = latency
+        self.calls = 0
+
+    def _embed(self, text):
+        vector = np.zeros(self.size, dtype=np.float32)
+        for token in tokenize(text):
+            digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+            vector[int.from_bytes(digest, "little") % self.size] += 1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        time.sleep(self.latency)
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        self.calls += 1
+        time.sleep(self.latency)
+        return self._embed(text)
+
+class EchoChatModel(SimpleChatModel):
+    """
+    Deterministic, offline chat model stand-in that answers with a summary of its prompt
+    after an optional simulated latency.
+    """
+
+    latency: float = 0.0
+
+    @property
+    def _llm_type(self):
+        return "echo"
+
+    def _call(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.latency)
+        prompt = "\n".join(str(message.content) for message in messages)
+        return f"Answer derived from {len(prompt)} prompt characters."
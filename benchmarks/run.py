@@ -0,0 +1,234 @@
+"""
+Offline benchmarks for RAGify's hot paths.
+
+Synthetic documents and the stand-ins in benchmarks/fakes.py replace the Google models, so
+no network or API key is needed. Run from the repository root:
+
+    python -m benchmarks.run --size 1 --output benchmark_results.json
+    python -m benchmarks.run --compare benchmark_results.json
+"""
+import os
+
+# Keep Chroma from sending telemetry while benchmarking offline
+os.environ.setdefault("ANONYMIZED_TELEMETRY", "False")
+
+import sys
+import json
+import time
+import platform
+import argparse
+import resource
+import tempfile
+import tracemalloc
+import statistics
+from langchain_core.documents import Document
+from ragify import create_vectorstore, create_rag_chain, chat_with_rag_chain, VECTORSTORE_BACKENDS
+from utils.ingestion import FILE_CHUNKERS
+from utils.pdf_pages import PageTextCache
+from utils.retrievers import HybridRetriever
+from benchmarks.fakes import HashingEmbeddings, EchoChatModel
+from benchmarks.synthetic import make_corpus, sentences
+from utils.constants import VECTORSTORE_BACKEND
+
+def summarize(latencies):
+    """
+    Returns mean, p50, p95 and max of a list of latencies in seconds.
+    """
+    ordered = sorted(latencies)
+    return {
+        "count": len(ordered),
+        "mean": statistics.fmean(ordered),
+        "p50": ordered[len(ordered) // 2],
+        "p95": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+        "max": ordered[-1],
+    }
+
+def max_rss_mb():
+    """
+    Returns the peak resident set size of this process in MB.
+    """
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+def synthetic_chunks(count, seed=0):
+    """
+    Returns count synthetic chunks of a few sentences each.
+    """
+    text = sentences(count * 5, seed)
+    return [
+        Document(page_content=" ".join(next(text) for _ in range(5)), metadata={"source": f"synthetic-{i // 50}"})
+        for i in range(count)
+    ]
+
+def bench_chunking(corpus, repeat, directory):
+    """
+    Measures the throughput of each chunk_* function on the synthetic files.
+
+    Every PDF run starts from an empty page text cache in directory, so "seconds" is the
+    cold extraction time; "warm_seconds" re-chunks the same file with every page cached.
+    """
+    results = {}
+    for ext, path in corpus.items():
+        chunker = FILE_CHUNKERS[ext]
+        timings, warm_timings = [], []
+        for run in range(repeat):
+            options = {"page_cache": PageTextCache(os.path.join(directory, f"pdf_pages_{run}.sqlite3"))} if ext == ".pdf" else {}
+            start = time.perf_counter()
+            chunks = chunker(path, **options)
+            timings.append(time.perf_counter() - start)
+
+            if options:
+                start = time.perf_counter()
+                chunker(path, **options)
+                warm_timings.append(time.perf_counter() - start)
+
+        seconds = statistics.median(timings)
+        file_bytes = os.path.getsize(path)
+        results[ext] = {
+            "chunker": chunker.__name__,
+            "file_bytes": file_bytes,
+            "chunks": len(chunks),
+            "seconds": seconds,
+            "mb_per_second": file_bytes / (1024 * 1024) / seconds,
+            "chunks_per_second": len(chunks) / seconds,
+        }
+        if warm_timings:
+            results[ext]["warm_seconds"] = statistics.median(warm_timings)
+    return results
+
+def bench_vectorstore(chunks, directory, backend=VECTORSTORE_BACKEND):
+    """
+    Measures create_vectorstore build time and memory with the offline embedding stand-in.
+    Memory is traced in a second build, since tracing slows the build down.
+    """
+    start = time.perf_counter()
+    vectorstore = create_vectorstore(chunks, os.path.join(directory, "timed"), embedding=HashingEmbeddings(), backend=backend)
+    seconds = time.perf_counter() - start
+
+    tracemalloc.start()
+    create_vectorstore(chunks, os.path.join(directory, "traced"), embedding=HashingEmbeddings(), backend=backend)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return vectorstore, {
+        "chunks": len(chunks),
+        "seconds": seconds,
+        "chunks_per_second": len(chunks) / seconds,
+        "peak_python_mb": peak / (1024 * 1024),
+        "max_rss_mb": max_rss_mb(),
+    }
+
+def bench_retrieval(corpus_sizes, queries, directory, backend=VECTORSTORE_BACKEND):
+    """
+    Measures hybrid retrieval latency at growing corpus sizes.
+    """
+    results = {}
+    for size in corpus_sizes:
+        vectorstore = create_vectorstore(
+            synthetic_chunks(size), os.path.join(directory, f"retrieval_{size}"), embedding=HashingEmbeddings(), backend=backend
+        )
+        retriever = HybridRetriever(vectorstore=vectorstore)
+        retriever.invoke(queries[0])  # Builds the keyword index outside the measurement
+
+        latencies = []
+        for query in queries:
+            start = time.perf_counter()
+            retriever.invoke(query)
+            latencies.append(time.perf_counter() - start)
+        results[str(size)] = summarize(latencies)
+    return results
+
+def bench_end_to_end(vectorstore, questions, llm_latency):
+    """
+    Measures chat_with_rag_chain latency for fresh questions and for cached repeats.
+    """
+    rag_chain = create_rag_chain(vectorstore, llm=EchoChatModel(latency=llm_latency))
+
+    def run(batch):
+        latencies = []
+        for question in batch:
+            start = time.perf_counter()
+            chat_with_rag_chain(rag_chain, question)
+            latencies.append(time.perf_counter() - start)
+        return summarize(latencies)
+
+    return {"fresh": run(questions), "repeated": run(questions)}
+
+def run_benchmarks(size=1, repeat=3, corpus_sizes=(100, 1000, 5000), queries=50, llm_latency=0.0, backend=VECTORSTORE_BACKEND):
+    """
+    Runs every benchmark and returns the results as a JSON-serializable dict.
+    """
+    questions = [f"What does the {question.rstrip('.').lower()} say?" for question in sentences(queries, seed=1)]
+
+    with tempfile.TemporaryDirectory() as directory:
+        corpus = make_corpus(os.path.join(directory, "files"), size=size)
+        chunking = bench_chunking(corpus, repeat, directory)
+
+        chunks = [chunk for path in corpus.values() for chunk in FILE_CHUNKERS[os.path.splitext(path)[1]](path)]
+        vectorstore, vectorstore_results = bench_vectorstore(chunks, os.path.join(directory, "vectorstore"), backend)
+
+        retrieval = bench_retrieval(corpus_sizes, questions, directory, backend)
+        end_to_end = bench_end_to_end(vectorstore, questions, llm_latency)
+
+    return {
+        "metadata": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "parameters": {"size": size, "repeat": repeat, "corpus_sizes": list(corpus_sizes), "queries": queries, "llm_latency": llm_latency, "backend": backend},
+        },
+        "results": {
+            "chunking": chunking,
+            "create_vectorstore": vectorstore_results,
+            "retrieval": retrieval,
+            "end_to_end": end_to_end,
+        },
+    }
+
+def flatten(results, prefix=""):
+    """
+    Flattens nested results into {"a.b.c": number}.
+    """
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            flat.update(flatten(value, name))
+        elif isinstance(value, (int, float)):
+            flat[name] = value
+    return flat
+
+def compare(baseline, current):
+    """
+    Prints the relative change of every timing between two result files.
+    """
+    before = flatten(baseline["results"])
+    after = flatten(current["results"])
+    for name in sorted(before.keys() & after.keys()):
+        if name.rsplit(".", 1)[-1] in ("seconds", "warm_seconds", "mean", "p50", "p95") and before[name]:
+            change = (after[name] - before[name]) / before[name] * 100
+            print(f"{name:60} {before[name]:10.4f} -> {after[name]:10.4f} ({change:+.1f}%)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Run RAGify's offline benchmarks.")
+    parser.add_argument("--size", type=int, default=1, help="Scale factor of the synthetic documents")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per chunking measurement")
+    parser.add_argument("--corpus-sizes", type=int, nargs="+", default=[100, 1000, 5000], help="Chunk counts for the retrieval benchmark")
+    parser.add_argument("--queries", type=int, default=50, help="Questions per latency measurement")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="Simulated LLM latency in seconds")
+    parser.add_argument("--backend", default=VECTORSTORE_BACKEND, choices=sorted(VECTORSTORE_BACKENDS), help="Vectorstore backend to measure")
+    parser.add_argument("--output", default="benchmark_results.json", help="Where to write the JSON results")
+    parser.add_argument("--compare", help="Earlier JSON results to compare against")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.size, args.repeat, args.corpus_sizes, args.queries, args.llm_latency, args.backend)
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), results)
+
+if __name__ == "__main__":
+    main()
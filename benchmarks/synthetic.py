@@ -0,0 +1,118 @@
+import os
+import random
+from docx import Document
+from pptx import Presentation
+from openpyxl import Workbook
+
+WORDS = (
+    "retrieval augmented generation chunk embedding vector index query answer context model "
+    "document page slide sheet row column paragraph section table figure summary report data "
+    "latency throughput memory cache batch stream token prompt score rank source metadata"
+).split()
+
+def sentences(count, seed=0):
+    """
+    Yields deterministic pseudo-random sentences.
+    """
+    rng = random.Random(seed)
+    for i in range(count):
+        words = rng.choices(WORDS, k=rng.randint(8, 20))
+        yield f"{' '.join(words).capitalize()} item-{i}."
+
+def make_txt(path, paragraphs, seed=0):
+    """
+    Writes a plain text file with the given number of paragraphs.
+    """
+    with open(path, "w", encoding="utf-8") as f:
+        for sentence in sentences(paragraphs, seed):
+            f.write(sentence + "\n\n")
+    return path
+
+def make_docx(path, paragraphs, seed=0):
+    """
+    Writes a Word document with the given number of paragraphs.
+    """
+    doc = Document()
+    for sentence in sentences(paragraphs, seed):
+        doc.add_paragraph(sentence)
+    doc.save(path)
+    return path
+
+def make_pptx(path, slides, seed=0):
+    """
+    Writes a PowerPoint file with a title and a few sentences on each slide.
+    """
+    presentation = Presentation()
+    text = sentences(slides * 4, seed)
+    for number in range(slides):
+        slide = presentation.slides.add_slide(presentation.slide_layouts[1])
+        slide.shapes.title.text = f"Slide {number + 1}"
+        slide.placeholders[1].text = "\n".join(next(text) for _ in range(4))
+    presentation.save(path)
+    return path
+
+def make_xlsx(path, rows, sheets=2, seed=0):
+    """
+    Writes an Excel workbook with the given number of rows on each sheet.
+    """
+    rng = random.Random(seed)
+    workbook = Workbook()
+    workbook.remove(workbook.active)
+    for sheet in range(sheets):
+        worksheet = workbook.create_sheet(f"Sheet{sheet + 1}")
+        worksheet.append(["id", "name", "category", "amount", "notes"])
+        for row in range(rows):
+            worksheet.append([row, f"part-{sheet}-{row}", rng.choice(WORDS), round(rng.random() * 1000, 2), " ".join(rng.choices(WORDS, k=6))])
+    workbook.save(path)
+    return path
+
+def make_pdf(path, pages, lines_per_page=45, seed=0):
+    """
+    Writes a minimal text-only PDF with the given number of pages.
+    """
+    def escape(text):
+        return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+    text = sentences(pages * lines_per_page, seed)
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", b"", b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    page_ids = []
+    for _ in range(pages):
+        lines = " ".join(f"({escape(next(text)[:95])}) '" for _ in range(lines_per_page))
+        stream = f"BT /F1 9 Tf 30 810 Td 11 TL {lines} ET".encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Contents %d 0 R "
+            b"/Resources << /Font << /F1 3 0 R >> >> >>" % len(objects)
+        )
+        page_ids.append(len(objects))
+    kids = " ".join(f"{page_id} 0 R" for page_id in page_ids)
+    objects[1] = f"<< /Type /Pages /Kids [{kids}] /Count {len(page_ids)} >>".encode()
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(output)
+    output += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        output += b"%010d 00000 n \n" % offset
+    output += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+
+    with open(path, "wb") as f:
+        f.write(output)
+    return path
+
+def make_corpus(directory, size=1, seed=0):
+    """
+    Writes one synthetic file per supported format and returns {extension: path}.
+    size scales every file linearly.
+    """
+    os.makedirs(directory, exist_ok=True)
+    return {
+        ".pdf": make_pdf(os.path.join(directory, "synthetic.pdf"), pages=20 * size, seed=seed),
+        ".docx": make_docx(os.path.join(directory, "synthetic.docx"), paragraphs=500 * size, seed=seed),
+        ".pptx": make_pptx(os.path.join(directory, "synthetic.pptx"), slides=40 * size, seed=seed),
+        ".xlsx": make_xlsx(os.path.join(directory, "synthetic.xlsx"), rows=2000 * size, seed=seed),
+        ".txt": make_txt(os.path.join(directory, "synthetic.txt"), paragraphs=500 * size, seed=seed),
+    }
@@ -1,127 +1,357 @@
-import pandas as pd
-from docx import Document 
-from pptx import Presentation
+import time
+import numpy as np
+from bisect import bisect_right
+from itertools import accumulate
+from functools import lru_cache
 from dotenv import load_dotenv
-from langchain_chroma import Chroma
-from langchain.prompts import ChatPromptTemplate
-from langchain.chains import create_retrieval_chain
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain.chains.combine_documents import create_stuff_documents_chain
-from langchain_google_genai import GoogleGenerativeAIEmbeddings, ChatGoogleGenerativeAI
-from langchain_community.document_loaders import YoutubeLoader, TextLoader, WebBaseLoader, PyPDFLoader
-from utils.constants import CHUNK_SIZE, CHUNK_OVERLAP, SIMILAR_DOCUMENTS, EMBEDDING_MODEL, LLM_MODEL
-
+from langchain_core.documents import Document as LangChainDocument
+from langchain_core.runnables import RunnablePassthrough
+from utils.embedding_cache import CachedEmbeddings
+from utils.embedding_engine import BatchEmbeddingEngine
+from utils.uploads import open_binary
+from utils.pdf_pages import iter_pages
+from utils.index_manager import upsert_chunks, delete_sources
+from utils.retrievers import HybridRetriever
+from utils.rerankers import get_reranker, rerank_report
+from utils.answer_cache import CachedRagChain
+from utils.lazy_imports import LazyRegistry, import_module, load_object
+from utils.tracing import trace, record, traced_chunker, tracing_callbacks
+from utils.constants import CHUNK_SIZE, CHUNK_OVERLAP, SIMILAR_DOCUMENTS, EMBEDDING_MODEL, LLM_MODEL, STREAM_WINDOW_CHUNKS, HYBRID_FETCH_K, CONTEXT_TOKEN_BUDGET, VECTORSTORE_BACKEND, RERANKER, RERANK_DEPTH
+
+# Parsers, vectorstores and model clients are imported on first use rather than here,
+# so the app renders its first page without paying for every format it supports
 load_dotenv()
 
+def make_text_splitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP):
+    """
+    Returns the recursive character text splitter used by every chunk_* function.
+    """
+    return load_object("langchain_text_splitters:RecursiveCharacterTextSplitter")(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+
+def split_text_stream(units, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP, window=STREAM_WINDOW_CHUNKS):
+    """
+    Splits a stream of (text, metadata) units such as pages, slides or paragraphs into chunks
+    without ever joining the whole document into one string.
+
+    Units are buffered until about `window` chunks worth of text is available. The last,
+    possibly incomplete chunk of each window is carried into the next one, so chunk
+    boundaries and overlap continue across units. Each chunk takes the metadata of the
+    unit it starts in.
+    """
+    text_splitter = make_text_splitter(chunk_size, chunk_overlap)
+    buffer, buffered = [], 0
+    split_seconds, split_chunks = 0.0, 0
+
+    def split_buffer():
+        text = "\n".join(unit_text for unit_text, _ in buffer)
+        unit_starts = list(accumulate((len(unit_text) + 1 for unit_text, _ in buffer[:-1]), initial=0))
+        search_from = 0
+        for piece in text_splitter.split_text(text):
+            position = text.find(piece, search_from)
+            search_from = max(position, 0) + 1
+            metadata = buffer[bisect_right(unit_starts, max(position, 0)) - 1][1]
+            yield piece, metadata
+
+    for unit in units:
+        buffer.append(unit)
+        buffered += len(unit[0])
+
+        if buffered >= chunk_size * window:
+            start = time.perf_counter()
+            pieces = list(split_buffer())
+            split_seconds += time.perf_counter() - start
+            split_chunks += len(pieces) - 1
+
+            for piece, metadata in pieces[:-1]:
+                yield LangChainDocument(page_content=piece, metadata=dict(metadata))
+            buffer = pieces[-1:]
+            buffered = sum(len(piece) for piece, _ in buffer)
+
+    start = time.perf_counter()
+    pieces = list(split_buffer())
+    split_seconds += time.perf_counter() - start
+
+    # Parsing time of a chunk_* stage is its wall time minus this splitting time
+    record("splitting", split_seconds, chunks=split_chunks + len(pieces))
+    for piece, metadata in pieces:
+        yield LangChainDocument(page_content=piece, metadata=dict(metadata))
+
+@traced_chunker
 def chunk_youtube_video(url, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP):
     """
     Loads the transcript of a YouTube video and splits it into chunks.
     """
-    loader = YoutubeLoader.from_youtube_url(url)
+    loader = load_object("langchain_community.document_loaders:YoutubeLoader").from_youtube_url(url)
     transcript = loader.load()
 
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    text_splitter = make_text_splitter(chunk_size, chunk_overlap)
     chunks = text_splitter.split_documents(transcript)
 
     return chunks
 
-def chunk_pdf(file_path, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP):
+def iter_pdf_chunks(file, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP, page_cache=None):
+    """
+    Lazily reads a PDF file page by page and yields chunks from its content.
+    file may be a path, a bytes-like buffer or a binary file object.
+    Page texts are extracted in parallel and cached by file hash, so re-chunking
+    the same file with other settings never parses it again. page_cache replaces
+    the process-wide PageTextCache, e.g. to measure cold extraction.
+    """
+    pages = ((text, {"page": number}) for number, text in enumerate(iter_pages(file, cache=page_cache)))
+    yield from split_text_stream(pages, chunk_size, chunk_overlap)
+
+@traced_chunker
+def chunk_pdf(file, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP, page_cache=None):
     """
     Reads a PDF file and creates chunks from its content.
     """
-    loader = PyPDFLoader(file_path)
-    docs = loader.load()
+    return list(iter_pdf_chunks(file, chunk_size, chunk_overlap, page_cache))
 
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
-    chunks = text_splitter.split_documents(docs)
+def serialize_rows(frame):
+    """
+    Serializes every row of a sheet as "header: value | header: value" using vectorized string operations.
+    """
+    pd = import_module("pandas")
+    cells = frame.fillna("").astype(str)
+    labels = ["" if str(column).startswith("Unnamed:") else f"{column}: " for column in frame.columns]
+    labelled = cells.radd(pd.Series(labels, index=cells.columns), axis=1).where(cells != "", "")
 
-    return chunks
+    columns = [labelled[column] for column in labelled.columns]
+    rows = columns[0].str.cat(columns[1:], sep=" | ") if len(columns) > 1 else columns[0]
+    return rows.str.replace(r"(\s\|\s)+", " | ", regex=True).str.strip(" |")
 
-def chunk_excel(file_path, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP):
+def byte_budget_boundaries(sizes, budget):
     """
-    Reads an Excel file and creates chunks from its content.
+    Returns the indices at which a sequence of row sizes must be cut so each group fits the budget.
     """
-    excel_data = pd.read_excel(file_path)
-    text = "\n".join(excel_data.astype(str).apply(' '.join, axis=1))
-
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
-    chunks = text_splitter.create_documents([text])
+    boundaries, used = [], 0
+    for index, size in enumerate(sizes.tolist()):
+        if used and used + size > budget:
+            boundaries.append(index)
+            used = 0
+        used += size
+    return boundaries
+
+def iter_excel_chunks(file, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP):
+    """
+    Reads every sheet of an Excel file and yields chunks of whole rows.
 
-    return chunks
+    Rows are grouped by a byte budget of chunk_size instead of re-splitting one joined
+    string, and each chunk records its sheet and Excel row range. Only a single row
+    larger than the budget is split further, using chunk_overlap.
+    file may be a path, a bytes-like buffer or a binary file object.
+    """
+    text_splitter = make_text_splitter(chunk_size, chunk_overlap)
+
+    with open_binary(file) as stream, import_module("pandas").ExcelFile(stream) as excel_file:
+        for sheet_name in excel_file.sheet_names:
+            frame = excel_file.parse(sheet_name, dtype=str).dropna(how="all")
+            if frame.empty:
+                continue
+
+            rows = serialize_rows(frame)
+            rows = rows[rows != ""]
+            if rows.empty:
+                continue
+            row_numbers = rows.index.to_numpy() + 2  # Excel rows are 1-based and row 1 holds the headers
+
+            # Greedily pack whole rows into chunks of at most chunk_size bytes
+            row_bytes = rows.str.encode("utf-8").str.len().to_numpy() + 1
+            boundaries = byte_budget_boundaries(row_bytes, chunk_size)
+
+            for texts, numbers in zip(np.split(rows.to_numpy(), boundaries), np.split(row_numbers, boundaries)):
+                text = "\n".join(texts)
+                metadata = {"sheet": sheet_name, "row_start": int(numbers[0]), "row_end": int(numbers[-1])}
+                pieces = text_splitter.split_text(text) if len(text) > chunk_size else [text]
+                for piece in pieces:
+                    yield LangChainDocument(page_content=piece, metadata=dict(metadata))
+
+@traced_chunker
+def chunk_excel(file, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP):
+    """
+    Reads an Excel file and creates chunks from its content.
+    """
+    return list(iter_excel_chunks(file, chunk_size, chunk_overlap))
 
+@traced_chunker
 def chunk_website(url, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP):
     """
     Fetches the content of a webpage and splits it into chunks.
     """
-    loader = WebBaseLoader(url)
+    loader = load_object("langchain_community.document_loaders:WebBaseLoader")(url)
     docs = loader.load()
 
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    text_splitter = make_text_splitter(chunk_size, chunk_overlap)
     chunks = text_splitter.split_documents(docs)
 
     return chunks
 
-def chunk_txt_file(file_path, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP):
+@traced_chunker
+def chunk_site(url, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP):
     """
-    Reads a plain text file and creates chunks from its content.
+    Crawls the pages of a website linked from url and splits them into chunks.
+    Each chunk keeps the URL and title of its page in its metadata.
     """
-    loader = TextLoader(file_path)
-    text = loader.load()
+    with trace("crawl") as attributes:
+        pages = load_object("utils.crawler:crawl_site")(url)
+        attributes["pages"] = len(pages)
+        attributes["changed_pages"] = sum(page["changed"] for page in pages)
 
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
-    chunks = text_splitter.split_documents(text)
+    docs = [LangChainDocument(page_content=page["text"], metadata={"url": page["url"], "title": page["title"]}) for page in pages]
+
+    text_splitter = make_text_splitter(chunk_size, chunk_overlap)
+    chunks = text_splitter.split_documents(docs)
 
     return chunks
 
-def chunk_word_doc(file_path, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP):
+@traced_chunker
+def chunk_txt_file(file, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP):
     """
-    Reads a Word document (.docx) and creates chunks from its content.
+    Reads a plain text file and creates chunks from its content.
+    file may be a path, a bytes-like buffer or a binary file object.
     """
-    doc = Document(file_path)
-    text = "\n".join([para.text for para in doc.paragraphs])
+    if isinstance(file, str):
+        text = load_object("langchain_community.document_loaders:TextLoader")(file).load()
+    else:
+        with open_binary(file) as stream:
+            text = [LangChainDocument(page_content=stream.read().decode("utf-8"))]
 
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
-    chunks = text_splitter.create_documents([text])
+    text_splitter = make_text_splitter(chunk_size, chunk_overlap)
+    chunks = text_splitter.split_documents(text)
 
     return chunks
 
-def chunk_pptx(file_path, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP):
+def iter_word_doc_chunks(file, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP):
     """
-    Reads a PowerPoint (.pptx) file and creates chunks from its content.
+    Reads a Word document (.docx) paragraph by paragraph and yields chunks from its content.
+    file may be a path, a bytes-like buffer or a binary file object.
+    """
+    with open_binary(file) as stream:
+        doc = load_object("docx:Document")(stream)
+    paragraphs = ((para.text, {}) for para in doc.paragraphs)
+    yield from split_text_stream(paragraphs, chunk_size, chunk_overlap)
+
+@traced_chunker
+def chunk_word_doc(file, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP):
+    """
+    Reads a Word document (.docx) and creates chunks from its content.
+    """
+    return list(iter_word_doc_chunks(file, chunk_size, chunk_overlap))
+
+def iter_pptx_chunks(file, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP):
+    """
+    Reads a PowerPoint (.pptx) file slide by slide and yields chunks from its content.
+    file may be a path, a bytes-like buffer or a binary file object.
     """
     # Load the PowerPoint presentation
-    presentation = Presentation(file_path)
-    text_content = []
+    with open_binary(file) as stream:
+        presentation = load_object("pptx:Presentation")(stream)
 
     # Extract text from each slide
-    for slide in presentation.slides:
-        for shape in slide.shapes:
-            if hasattr(shape, "text"):
-                text_content.append(shape.text)
+    slides = (
+        ("\n".join(shape.text for shape in slide.shapes if hasattr(shape, "text")), {"slide": number})
+        for number, slide in enumerate(presentation.slides, start=1)
+    )
+    yield from split_text_stream(slides, chunk_size, chunk_overlap)
+
+@traced_chunker
+def chunk_pptx(file, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP):
+    """
+    Reads a PowerPoint (.pptx) file and creates chunks from its content.
+    """
+    return list(iter_pptx_chunks(file, chunk_size, chunk_overlap))
 
-    full_text = "\n".join(text_content)
+@lru_cache(maxsize=None)
+def get_embedding_model():
+    """
+    Returns the embedding model wrapped in the persistent embedding cache.
+    The client is shared by every session of the process.
+    """
+    GoogleGenerativeAIEmbeddings = load_object("langchain_google_genai:GoogleGenerativeAIEmbeddings")
+    engine = BatchEmbeddingEngine(GoogleGenerativeAIEmbeddings(model=EMBEDDING_MODEL))
+    cached_embeddings = CachedEmbeddings(engine)
 
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
-    chunks = text_splitter.create_documents([full_text])
+    # Each batch is cached as soon as it is embedded, so a failed run resumes where it stopped
+    engine.on_batch = cached_embeddings.store_texts
+    return cached_embeddings
 
-    return chunks
+@lru_cache(maxsize=None)
+def get_llm():
+    """
+    Returns the chat model client shared by every session of the process.
+    """
+    ChatGoogleGenerativeAI = load_object("langchain_google_genai:ChatGoogleGenerativeAI")
+    return ChatGoogleGenerativeAI(model=LLM_MODEL, temperature=0.3, max_tokens=None)
 
-def create_vectorstore(chunks, persist_directory):
+# Chroma keeps float32 embeddings; the quantized store maps int8 codes from disk and opens instantly
+VECTORSTORE_BACKENDS = LazyRegistry({
+    "chroma": "langchain_chroma:Chroma",
+    "quantized": "utils.quantized_store:QuantizedVectorStore",
+})
+
+def create_vectorstore(chunks, persist_directory, collection_name="langchain", embedding=None, backend=VECTORSTORE_BACKEND, on_batch=None):
     """
     Creates a vectorstore from the chunks.
+    Chunks may be any iterable, such as an iter_*_chunks generator; they are embedded in fixed-size batches.
+    The shared cached embedding model is used unless another embedding is given.
+    backend names one of VECTORSTORE_BACKENDS; on_batch is passed on to upsert_chunks.
     """
-    return Chroma.from_documents(documents=chunks, embedding=GoogleGenerativeAIEmbeddings(model=EMBEDDING_MODEL), persist_directory=persist_directory)
+    embedding = embedding if embedding is not None else get_embedding_model()
+    with trace("create_vectorstore", backend=backend) as attributes:
+        vectorstore = VECTORSTORE_BACKENDS[backend](collection_name=collection_name, persist_directory=persist_directory, embedding_function=embedding)
+        attributes["added"], attributes["removed"] = upsert_chunks(vectorstore, chunks, on_batch=on_batch)
+    return vectorstore
     # return Chroma.from_documents(documents=chunks, embedding=GoogleGenerativeAIEmbeddings(model=EMBEDDING_MODEL))
 
-
-def create_rag_chain(vectorstore):
+def close_vectorstore(vectorstore):
     """
-    Creates a retrieval-augmented generation (RAG) chain.
+    Frees what a vectorstore keeps open beyond its Python references. chromadb caches the
+    system of every persist directory for the whole process, with its HNSW indexes and
+    SQLite connection, so a Chroma store's system is stopped and dropped from that cache.
+    """
+    identifier = getattr(getattr(vectorstore, "_client", None), "_identifier", None)
+    if identifier is None:
+        return
+    SharedSystemClient = load_object("chromadb.api.shared_system_client:SharedSystemClient")
+    system = SharedSystemClient._identifier_to_system.pop(identifier, None)
+    if system is not None:
+        system.stop()
+
+def update_vectorstore(vectorstore, chunks, removed_sources=(), on_batch=None):
     """
+    Incrementally updates an existing vectorstore in place, so retrievers built on it stay valid.
+    """
+    with trace("update_vectorstore") as attributes:
+        removed = delete_sources(vectorstore, removed_sources)
+        added, replaced = upsert_chunks(vectorstore, chunks, on_batch=on_batch)
+        attributes["added"], attributes["removed"] = added, removed + replaced
+    return vectorstore
+
 
-    retriever = vectorstore.as_retriever(search_type="similarity", search_kwargs={"k": SIMILAR_DOCUMENTS}) # k: 10 means retrive ten similar documents from documents in the vectorstore
+def create_retriever(vectorstore):
+    """
+    Creates the retriever of the RAG chain for a vectorstore.
+    """
 
-    llm = ChatGoogleGenerativeAI(model=LLM_MODEL, temperature=0.3, max_tokens=None)
+    # Dense and keyword matches are fused, so fewer chunks are needed in the prompt for the same recall
+    # A wide candidate set is reranked down to the best few, and only their sentences relevant
+    # to the question are stuffed into the prompt, within a fixed token budget
+    return HybridRetriever(
+        vectorstore=vectorstore,
+        k=SIMILAR_DOCUMENTS,
+        fetch_k=HYBRID_FETCH_K,
+        reranker=get_reranker(RERANKER),
+        rerank_depth=RERANK_DEPTH,
+        token_budget=CONTEXT_TOKEN_BUDGET,
+    )
+
+def create_answer_chain(llm=None):
+    """
+    Creates the chain that answers a question from already retrieved documents.
+    It takes {"input": question, "context": documents} and returns the answer text.
+    The shared chat model is used unless another llm is given.
+    """
+    llm = llm if llm is not None else get_llm()
 
     system_prompt = (
             "You are an assistant for question-answering tasks. "
@@ -129,15 +359,24 @@ def create_rag_chain(vectorstore):
             "the question. If you don't know the answer, say that you don't know."
         )
 
-    prompt = ChatPromptTemplate.from_messages([
+    prompt = load_object("langchain_core.prompts:ChatPromptTemplate").from_messages([
         ("system", system_prompt),
         ("user", "Answer the question based on the context below:\n\n{context}\n\nQuestion: {input}"),
     ])
 
-    question_answer_chain =  create_stuff_documents_chain(llm, prompt)
-    rag_chain = create_retrieval_chain(retriever, question_answer_chain)
+    return load_object("langchain.chains.combine_documents:create_stuff_documents_chain")(llm, prompt)
 
-    return rag_chain
+def create_rag_chain(vectorstore, llm=None):
+    """
+    Creates a retrieval-augmented generation (RAG) chain.
+    The shared chat model is used unless another llm is given.
+    """
+    rag_chain = (
+        load_object("langchain.chains:create_retrieval_chain")(create_retriever(vectorstore), create_answer_chain(llm)) | RunnablePassthrough.assign(rerank=rerank_report)
+    ).with_config(callbacks=[tracing_callbacks])
+
+    # Repeated and near-duplicate questions about the same corpus are answered from the cache
+    return CachedRagChain(rag_chain, vectorstore)
 
 def chat_with_rag_chain(rag_chain, question):
     """
@@ -146,6 +385,20 @@ def chat_with_rag_chain(rag_chain, question):
     response = rag_chain.invoke({"input": question})
     return response["answer"]
 
+def stream_rag_chain(rag_chain, question):
+    """
+    Streams the RAG chain output for a given question.
+    Yields ("context", documents) once retrieval is done, then ("answer", token) as tokens arrive
+    and finally ("rerank", report) with the rerank time and scores, unless the answer was cached.
+    """
+    for chunk in rag_chain.stream({"input": question}):
+        if "context" in chunk:
+            yield "context", chunk["context"]
+        if "answer" in chunk:
+            yield "answer", chunk["answer"]
+        if chunk.get("rerank"):
+            yield "rerank", chunk["rerank"]
+
 def main():
     """
     Main function to run the RAG chain.
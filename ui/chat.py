@@ -1,12 +1,26 @@
 import streamlit as st
-from ragify import chat_with_rag_chain
-from utils.constants import CHAT_USER_ICON, CHAT_AI_ICON
+from ragify import stream_rag_chain
+from utils.constants import CHAT_USER_ICON, CHAT_AI_ICON, CHAT_HISTORY_WINDOW_TURNS
 
 def load_chat_history():
     """
-    Displays the chat history in the Streamlit app.
+    Displays the most recent turns of the chat history in the Streamlit app.
+    Older turns are only read and rendered when the user asks for them.
     """
-    for msg in st.session_state.messages:
+    history = st.session_state.messages
+    shown = min(len(history), 2 * st.session_state.chat_turns_shown)
+    hidden = len(history) - shown
+
+    if hidden > history.dropped:
+        # The label must not change with the message count, or a click made after a new turn is lost
+        st.caption(f"{hidden - history.dropped} older messages hidden.")
+        if st.button("Show older messages", key="show_older_messages", use_container_width=True):
+            st.session_state.chat_turns_shown += CHAT_HISTORY_WINDOW_TURNS
+            st.rerun()
+    elif history.dropped:
+        st.caption(f"{history.dropped} older messages were removed to save memory.")
+
+    for msg in history.window(hidden, len(history)):
         with st.chat_message(msg["role"]):
             st.markdown(msg["content"])
 
@@ -15,17 +29,17 @@ def handle_user_prompt(prompt):
     Handles the user prompt and generates a response using the RAG chain.
     """
     # Add user message to chat history
-    st.session_state.messages.append({"role": CHAT_USER_ICON, "content": prompt})
+    st.session_state.messages.append(CHAT_USER_ICON, prompt)
     with st.chat_message(CHAT_USER_ICON):
         st.markdown(prompt)
 
-    # Generate response using RAG chain
-    with st.spinner("Generating response..."):
-        response = chat_with_rag_chain(st.session_state.rag_chain, prompt)
-
-    # Add assistant message to chat history
-    st.session_state.messages.append({"role": CHAT_AI_ICON, "content": response})
+    # Render the response token by token as the RAG chain generates it
     with st.chat_message(CHAT_AI_ICON):
-        st.markdown(response)
+        response = st.write_stream(
+            token for kind, token in stream_rag_chain(st.session_state.rag_chain, prompt) if kind == "answer"
+        )
+
+        # Add assistant message to chat history
+        st.session_state.messages.append(CHAT_AI_ICON, response)
         if len(st.session_state.messages) == 2:
             st.rerun()
\ No newline at end of file
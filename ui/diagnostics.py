@@ -0,0 +1,55 @@
+import streamlit as st
+from ragify import get_embedding_model
+from utils.answer_cache import answer_cache
+from utils.lazy_imports import import_report
+from utils.tracing import spans, stage_summary, export_json_lines, export_prometheus
+
+def diagnostics_panel():
+    """
+    Shows per-stage timings of recent ingestion and chat requests in the sidebar.
+    """
+    with st.sidebar.expander("Diagnostics", expanded=False):
+        summary = stage_summary()
+        if not summary:
+            st.caption("No stages recorded yet.")
+            return
+
+        st.markdown("**Stages**")
+        st.dataframe(
+            [
+                {
+                    "stage": stage,
+                    "count": values["count"],
+                    "total (s)": round(values["total"], 3),
+                    "p50 (s)": round(values["p50"], 3),
+                    "p95 (s)": round(values["p95"], 3),
+                    **values["attributes"],
+                }
+                for stage, values in summary.items()
+            ],
+            hide_index=True,
+            use_container_width=True,
+        )
+
+        st.markdown("**Caches**")
+        caches = {"answers": answer_cache.stats(), "chat_history": st.session_state.messages.stats()}
+        # Building the embedding client needs credentials, so only a client some session already built is reported
+        if get_embedding_model.cache_info().currsize:
+            caches["embeddings"] = get_embedding_model().stats()
+        st.json(caches, expanded=False)
+
+        st.markdown("**Lazy imports**")
+        st.dataframe(
+            [{"module": row["module"], "first import (s)": round(row["seconds"], 3)} for row in import_report()],
+            hide_index=True,
+            use_container_width=True,
+        )
+
+        st.markdown("**Recent spans**")
+        st.dataframe(list(spans)[-50:][::-1], hide_index=True, use_container_width=True)
+
+        col1, col2 = st.columns(2)
+        with col1:
+            st.download_button("JSON lines", export_json_lines(), file_name="ragify_traces.jsonl", use_container_width=True)
+        with col2:
+            st.download_button("Prometheus", export_prometheus(), file_name="ragify_metrics.prom", use_container_width=True)
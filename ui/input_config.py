@@ -27,6 +27,11 @@ def select_input_method():
         min_value=0, max_value=MAX_NO_OF_WEBSITE_URL, step=1
     ))
 
+    st.session_state.crawl_websites = st.checkbox(
+        "Crawl the pages each website URL links to on the same site",
+        disabled=st.session_state.no_of_website_urls == 0,
+    )
+
     disable_button = False
     if st.session_state.file_extensions == [] and st.session_state.no_of_yt_urls == 0 and st.session_state.no_of_website_urls == 0:
         disable_button = True
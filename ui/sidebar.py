@@ -1,26 +1,18 @@
-import os
 import streamlit as st
-from ragify import (
-    chunk_pdf,
-    chunk_word_doc,
-    chunk_pptx,
-    chunk_txt_file,
-    chunk_excel,
-    chunk_youtube_video,
-    chunk_website,
-    create_vectorstore,
-    create_rag_chain,
-)
+from ui.diagnostics import diagnostics_panel
 from utils.session import reset_session
-from utils.constants import FILE_UPLOAD_DIRECTORY
-
-# Uploads directory
-os.makedirs(FILE_UPLOAD_DIRECTORY, exist_ok=True)
+from utils.ingestion import ingestion_job, upload_source, url_source
+from utils.jobs import job_queue
+from utils.constants import JOB_POLL_SECONDS, CHAT_HISTORY_WINDOW_TURNS
 
 def check_content_changed(uploaded_filenames, yt_urls, website_urls):
     """
     Check if the content has changed based on the uploaded files, YouTube URLs, and website URLs.
     """
+
+    # Check if any processed source has been removed
+    if get_removed_sources(uploaded_filenames, yt_urls, website_urls):
+        return True
     
     # Check if any of the inputs have changed
     if (
@@ -42,12 +34,82 @@ def check_content_changed(uploaded_filenames, yt_urls, website_urls):
         
     return False
 
+def get_removed_sources(uploaded_filenames, yt_urls, website_urls):
+    """
+    Returns the sources of processed files and URLs that are no longer in the inputs.
+    """
+    removed_sources = [filename for filename in st.session_state.processed_files if filename not in uploaded_filenames]
+    removed_sources += [yt_url for yt_url in st.session_state.processed_yt_urls if yt_url not in yt_urls]
+    removed_sources += [website_url for website_url in st.session_state.processed_website_urls if website_url not in website_urls]
+    return removed_sources
+
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def ingestion_status():
+    """
+    Polls the session's ingestion job and shows its progress until it finishes.
+    """
+    job = st.session_state.ingestion_job
+    if job is None:
+        return
+    if job.finished:
+        # Rerun the whole app so the result is applied everywhere at once
+        st.rerun()
+
+    st.progress(job.progress, text=f"{job.status.capitalize()}: {job.message or 'waiting for a worker...'}")
+    if st.button("Cancel Processing", use_container_width=True):
+        job.cancel()
+
+def apply_ingestion_job(job):
+    """
+    Applies a finished ingestion job to the session, swapping in its corpus and chain in one step.
+    """
+    st.session_state.ingestion_job = None
+    result = job.result
+    job_queue.discard(job)
+
+    if job.status == "cancelled":
+        st.session_state.toast_message = "Processing cancelled."
+        st.rerun()
+    if job.status == "failed":
+        st.sidebar.error(f"Error processing content: {job.error}")
+        return
+
+    removed = set(result["removed"])
+    st.session_state.processed_files = [name for name in st.session_state.processed_files if name not in removed]
+    st.session_state.processed_yt_urls = [url for url in st.session_state.processed_yt_urls if url not in removed]
+    st.session_state.processed_website_urls = [url for url in st.session_state.processed_website_urls if url not in removed]
+
+    for source in result["succeeded"]:
+        if source["kind"] == "file":
+            st.session_state.processed_files.append(source["name"])
+        elif source["kind"] == "youtube":
+            st.session_state.processed_yt_urls.append(source["name"])
+        else:
+            st.session_state.processed_website_urls.append(source["name"])
+    st.session_state.source_fingerprints = result["fingerprints"]
+
+    if result["corpus"] is not None:
+        st.session_state.corpus = result["corpus"]
+        st.session_state.vectorstore, st.session_state.rag_chain = result["corpus"].resource
+
+    if result["reopened"]:
+        st.session_state.toast_message = "Reopened previously processed content!"
+    else:
+        st.session_state.toast_message = "Content processed successfully!"
+    if result["dropped"]:
+        st.session_state.toast_message += f" Skipped {result['dropped']} duplicate chunks."
+    for source, error in result["failed"]:
+        st.session_state.toast_message += f" Failed to process {source['name']}: {error}"
+
+    st.rerun()
+
 @st.dialog("Are you sure you want to clear chats?")
 def clear_chat():
     col1, col2 = st.columns(2)
     with col1:
         if st.button("Yeah, don't care", use_container_width=True):
-            st.session_state.messages = []
+            st.session_state.messages.clear()
+            st.session_state.chat_turns_shown = CHAT_HISTORY_WINDOW_TURNS
             st.rerun()
     with col2:
         if st.button("No, want to read them", use_container_width=True):
@@ -90,83 +152,45 @@ def sidebar():
                 website_urls.append(site_url)
 
     uploaded_filenames = [f.name for f in uploaded_files]
-    
-    if st.sidebar.button("Start Processing", use_container_width=True, disabled=not check_content_changed(uploaded_filenames, yt_urls, website_urls)):
-        all_chunks = []
+
+    job = st.session_state.ingestion_job
+    if job is not None and job.finished:
+        apply_ingestion_job(job)
+    elif job is not None:
+        with st.sidebar:
+            ingestion_status()
+
+    processing = st.session_state.ingestion_job is not None
+    if st.sidebar.button("Start Processing", use_container_width=True, disabled=processing or not check_content_changed(uploaded_filenames, yt_urls, website_urls)):
+        sources = []
+        removed_sources = get_removed_sources(uploaded_filenames, yt_urls, website_urls)
 
         try:
-            # Process uploaded files
-            if uploaded_files:
-                uploaded_filenames = [f.name for f in uploaded_files]
-
-                if uploaded_filenames != st.session_state.processed_files:
-
-                    with st.spinner("Processing Content..."):
-                        for uploaded_file in uploaded_files:
-                            if uploaded_file.name not in st.session_state.processed_files:
-                                # Get the file extension
-                                filename = uploaded_file.name
-                                ext = os.path.splitext(filename)[1].lower()
-
-                                # Save the file temporarily
-                                save_path = os.path.join(FILE_UPLOAD_DIRECTORY, filename)
-                                with open(save_path, "wb") as f:
-                                    f.write(uploaded_file.read())
-
-                                print(f"Processing file: {filename} with extension: {ext}")
-
-                                # Call the appropriate chunking function
-                                if ext == ".pdf":
-                                    chunks = chunk_pdf(save_path)
-                                elif ext == ".docx":
-                                    chunks = chunk_word_doc(save_path)
-                                elif ext == ".pptx":
-                                    chunks = chunk_pptx(save_path)
-                                elif ext == ".txt":
-                                    chunks = chunk_txt_file(save_path)
-                                elif ext == ".xlsx":
-                                    chunks = chunk_excel(save_path)
-                                else:
-                                    st.error(f"Unsupported file type: {ext}")
-                                    continue
-
-                                all_chunks.extend(chunks)
-
-                    st.session_state.processed_files = uploaded_filenames
-
-            # Process YouTube URLs
+            # Uploads are ingested from the buffer Streamlit already holds instead of being saved under their name
+            for uploaded_file in uploaded_files:
+                if uploaded_file.name not in st.session_state.processed_files:
+                    sources.append(upload_source(uploaded_file.name, uploaded_file.getbuffer()))
+
             for yt_url in yt_urls:
                 if yt_url and yt_url not in st.session_state.processed_yt_urls:
-                    
-                    with st.spinner(f"Processing YouTube: {yt_url}"):
-                        try:
-                            chunks = chunk_youtube_video(yt_url)
-                            all_chunks.extend(chunks)
-                            st.session_state.setdefault("processed_yt_urls", []).append(yt_url)
-                        except Exception:
-                            st.error(f"Failed to process YouTube URL: {yt_url}")
-
-            # Process website URLs
+                    sources.append(url_source("youtube", yt_url))
+
             for website_url in website_urls:
                 if website_url and website_url not in st.session_state.processed_website_urls:
-                    
-                    with st.spinner(f"Processing Website: {website_url}"):
-                        try:
-                            if website_url.startswith("http"):
-                                chunks = chunk_website(website_url)
-                                all_chunks.extend(chunks)
-                                st.session_state.setdefault("processed_website_urls", []).append(website_url)
-                            else:
-                                st.error(f"Invalid URL (must start with http/https): {website_url}")
-                        except Exception:
-                            st.error(f"Failed to process Website URL: {website_url}")
-            
-            # Create vector store and RAG chain if chunks are generated
-            if len(all_chunks) > 0:
-                vectorstore = create_vectorstore(all_chunks, st.session_state.persist_directory)
-                st.session_state.rag_chain = create_rag_chain(vectorstore)
-                st.session_state.toast_message = "Content processed successfully!"
-                st.rerun()
+                    if website_url.startswith("http"):
+                        sources.append(url_source("crawl" if st.session_state.crawl_websites else "website", website_url))
+                    else:
+                        st.error(f"Invalid URL (must start with http/https): {website_url}")
+
+            # Parsing and embedding run on a worker thread, so reruns never block on or cut off processing
+            st.session_state.ingestion_job = job_queue.submit(
+                ingestion_job,
+                sources,
+                st.session_state.corpus,
+                removed_sources,
+                st.session_state.source_fingerprints,
+            )
+            st.rerun()
 
         except Exception as e:
             st.error(f"Error processing content: {e}")
@@ -187,4 +211,6 @@ def sidebar():
     if st.session_state.processed_website_urls != []:
         with st.sidebar.status("Website URLs", state="complete"):
             for website_url in st.session_state.processed_website_urls:
-                st.write(f"- {website_url}")
\ No newline at end of file
+                st.write(f"- {website_url}")
+
+    diagnostics_panel()
@@ -0,0 +1,135 @@
+import time
+import threading
+import numpy as np
+from collections import OrderedDict
+from langchain_core.runnables import Runnable
+from utils.index_manager import vectorstore_fingerprint
+from utils.tracing import trace
+from utils.constants import ANSWER_CACHE_SIMILARITY, ANSWER_CACHE_TTL, ANSWER_CACHE_MAX_ENTRIES
+
+def normalize_question(question):
+    """
+    Normalizes a question for exact matching.
+    """
+    return " ".join(question.lower().split())
+
+class SemanticAnswerCache:
+    """
+    Size-bounded, expiring cache of answers keyed by corpus fingerprint and question.
+
+    A question is answered from the cache when it matches a cached question of the same
+    corpus exactly, or when the cosine similarity of their embeddings reaches the threshold.
+    Since entries are keyed by the corpus fingerprint, any change to the vectorstore makes
+    the old answers unreachable; they then expire or are evicted least recently used first.
+    """
+
+    def __init__(self, threshold=ANSWER_CACHE_SIMILARITY, ttl=ANSWER_CACHE_TTL, max_entries=ANSWER_CACHE_MAX_ENTRIES):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _expire(self):
+        now = time.monotonic()
+        for key in [key for key, entry in self._entries.items() if now - entry["created"] > self.ttl]:
+            del self._entries[key]
+
+    def lookup(self, fingerprint, question, embed_question):
+        """
+        Returns the cached response for the question, or None. embed_question() is only called
+        when there is no exact match, so exact repeats never reach the embedding model.
+        """
+        with self._lock:
+            self._expire()
+            key = (fingerprint, normalize_question(question))
+            entry = self._entries.get(key)
+            candidates = [(k, e) for k, e in self._entries.items() if k[0] == fingerprint]
+
+        if entry is None and candidates:
+            vector = np.asarray(embed_question(), dtype=np.float32)
+            vector /= np.linalg.norm(vector) or 1.0
+            similarities = np.stack([e["vector"] for _, e in candidates]) @ vector
+            best = int(np.argmax(similarities))
+            if similarities[best] >= self.threshold:
+                key, entry = candidates[best]
+
+        with self._lock:
+            if entry is None or key not in self._entries:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry["response"]
+
+    def store(self, fingerprint, question, question_vector, response):
+        """
+        Caches a response and evicts the least recently used entries above max_entries.
+        """
+        vector = np.asarray(question_vector, dtype=np.float32)
+        vector /= np.linalg.norm(vector) or 1.0
+        with self._lock:
+            key = (fingerprint, normalize_question(question))
+            self._entries[key] = {"vector": vector, "response": response, "created": time.monotonic()}
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        """
+        Returns the hit/miss counters and the number of cached answers.
+        """
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+# Shared by every session of this Streamlit process
+answer_cache = SemanticAnswerCache()
+
+class CachedRagChain(Runnable):
+    """
+    Answers questions from the semantic answer cache and falls back to the wrapped RAG chain.
+    Responses have the same keys as the wrapped chain plus "cached".
+    """
+
+    def __init__(self, rag_chain, vectorstore, cache=answer_cache):
+        self.rag_chain = rag_chain
+        self.vectorstore = vectorstore
+        self.cache = cache
+
+    def _lookup(self, question):
+        with trace("answer_cache") as attributes:
+            fingerprint = vectorstore_fingerprint(self.vectorstore)
+            response = self.cache.lookup(fingerprint, question, lambda: self.vectorstore.embeddings.embed_query(question))
+            attributes["hit"] = response is not None
+        return fingerprint, response
+
+    def _store(self, fingerprint, question, response):
+        question_vector = self.vectorstore.embeddings.embed_query(question)
+        self.cache.store(fingerprint, question, question_vector, {"context": response["context"], "answer": response["answer"]})
+
+    def invoke(self, input, config=None, **kwargs):
+        fingerprint, cached = self._lookup(input["input"])
+        if cached is not None:
+            return {"input": input["input"], **cached, "cached": True}
+
+        response = self.rag_chain.invoke(input, config, **kwargs)
+        self._store(fingerprint, input["input"], response)
+        return {**response, "cached": False}
+
+    def stream(self, input, config=None, **kwargs):
+        fingerprint, cached = self._lookup(input["input"])
+        if cached is not None:
+            yield {"context": cached["context"], "cached": True}
+            yield {"answer": cached["answer"]}
+            return
+
+        context, answer = [], []
+        for chunk in self.rag_chain.stream(input, config, **kwargs):
+            if "context" in chunk:
+                context = chunk["context"]
+            if "answer" in chunk:
+                answer.append(chunk["answer"])
+            yield chunk
+        self._store(fingerprint, input["input"], {"context": context, "answer": "".join(answer)})
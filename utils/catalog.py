@@ -0,0 +1,192 @@
+import os
+import json
+import glob
+import time
+import uuid
+import shutil
+import sqlite3
+import hashlib
+import threading
+from functools import lru_cache
+from utils.constants import VECTORSTORE_DIRECTORY, CATALOG_PATH, VECTORSTORE_DISK_QUOTA_MB, ORPHAN_GRACE_SECONDS
+
+def file_fingerprint(file_path, block_size=1 << 20):
+    """
+    Returns the sha256 of a file's content.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def url_fingerprint(url, chunks):
+    """
+    Returns a fingerprint of a URL and the content fetched from it.
+    """
+    digest = hashlib.sha256(url.encode("utf-8"))
+    for chunk in chunks:
+        digest.update(b"\x00" + chunk.page_content.encode("utf-8"))
+    return digest.hexdigest()
+
+def sources_key(sources):
+    """
+    Returns a key for a set of {source: source fingerprint} pairs.
+    """
+    return hashlib.sha256(json.dumps(sorted(sources.items())).encode("utf-8")).hexdigest()
+
+def directory_size(directory):
+    """
+    Returns the size in bytes of every file below a directory.
+    """
+    size = 0
+    for root, _, files in os.walk(directory):
+        for name in files:
+            try:
+                size += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return size
+
+class CorpusCatalog:
+    """
+    SQLite catalog of persisted corpora.
+
+    Each corpus fingerprint maps to the directory and Chroma collection it is stored in and
+    to the fingerprints of the sources it was built from (file content hashes, URL + fetched
+    content hashes), so a later session with the same sources reopens it from disk instead
+    of parsing and embedding them again.
+    """
+
+    def __init__(self, path=CATALOG_PATH, root=VECTORSTORE_DIRECTORY):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS corpora ("
+            "fingerprint TEXT PRIMARY KEY, directory TEXT NOT NULL, collection_name TEXT NOT NULL, "
+            "sources_key TEXT NOT NULL, sources TEXT NOT NULL, created REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS corpora_sources_key ON corpora (sources_key)")
+        # Catalogs written before the backend was recorded only hold Chroma collections
+        try:
+            self._conn.execute("ALTER TABLE corpora ADD COLUMN backend TEXT NOT NULL DEFAULT 'chroma'")
+        except sqlite3.OperationalError:
+            pass
+        self._conn.commit()
+
+    def new_directory(self, fingerprint):
+        """
+        Returns a fresh directory for a corpus. Names are never reused, so a deleted
+        directory can never be confused with a client Chroma still caches for it.
+        """
+        return os.path.join(self.root, f"{fingerprint[:16]}_{uuid.uuid4().hex[:8]}")
+
+    def _row(self, row):
+        if row is None:
+            return None
+        fingerprint, directory, collection_name, sources, backend = row
+        return {
+            "fingerprint": fingerprint,
+            "directory": directory,
+            "collection_name": collection_name,
+            "sources": json.loads(sources),
+            "backend": backend,
+        }
+
+    def get(self, fingerprint):
+        """
+        Returns the catalog record of a corpus fingerprint, or None.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT fingerprint, directory, collection_name, sources, backend FROM corpora WHERE fingerprint = ?", (fingerprint,)
+            ).fetchone()
+        return self._row(row)
+
+    def find(self, sources):
+        """
+        Returns the most recently used corpus built from exactly these sources, or None.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT fingerprint, directory, collection_name, sources, backend FROM corpora WHERE sources_key = ? ORDER BY last_used DESC LIMIT 1",
+                (sources_key(sources),),
+            ).fetchone()
+        return self._row(row)
+
+    def register(self, fingerprint, directory, collection_name, sources, backend):
+        """
+        Records a persisted corpus, the vectorstore backend holding it and the sources it was built from.
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO corpora "
+                "(fingerprint, directory, collection_name, sources_key, sources, created, last_used, backend) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (fingerprint, directory, collection_name, sources_key(sources), json.dumps(sources), now, now, backend),
+            )
+            self._conn.commit()
+
+    def touch(self, fingerprint):
+        """
+        Marks a corpus as recently used.
+        """
+        with self._lock:
+            self._conn.execute("UPDATE corpora SET last_used = ? WHERE fingerprint = ?", (time.time(), fingerprint))
+            self._conn.commit()
+
+    def collect_garbage(self, in_use=(), quota_mb=VECTORSTORE_DISK_QUOTA_MB):
+        """
+        Deletes vectorstore directories no record points to, then the least recently used
+        corpora until the rest fits the disk quota. Corpora whose fingerprint is in in_use,
+        directories created for them and directories modified within ORPHAN_GRACE_SECONDS
+        are never deleted.
+        Returns the number of deleted directories.
+        """
+        with self._lock:
+            rows = self._conn.execute("SELECT fingerprint, directory FROM corpora ORDER BY last_used ASC").fetchall()
+
+        known = {os.path.abspath(directory) for _, directory in rows}
+        # A corpus still being built has no record yet, but its directory is named after it
+        prefixes = tuple(f"{fingerprint[:16]}_" for fingerprint in in_use)
+        # Timestamped directories were created per session by earlier versions of the app
+        candidates = glob.glob(os.path.join(self.root, "*")) + glob.glob("./????-??-??_??-??-??_vectorstore")
+        now = time.time()
+        deleted = 0
+
+        for directory in candidates:
+            if not os.path.isdir(directory) or os.path.abspath(directory) in known:
+                continue
+            if os.path.basename(directory).startswith(prefixes):
+                continue
+            if now - os.path.getmtime(directory) < ORPHAN_GRACE_SECONDS:
+                continue
+            shutil.rmtree(directory, ignore_errors=True)
+            deleted += 1
+
+        sizes = {fingerprint: directory_size(directory) for fingerprint, directory in rows}
+        total = sum(sizes.values())
+        for fingerprint, directory in rows:
+            if total <= quota_mb * 1024 * 1024:
+                break
+            if fingerprint in in_use:
+                continue
+            shutil.rmtree(directory, ignore_errors=True)
+            with self._lock:
+                self._conn.execute("DELETE FROM corpora WHERE fingerprint = ?", (fingerprint,))
+                self._conn.commit()
+            total -= sizes[fingerprint]
+            deleted += 1
+
+        return deleted
+
+@lru_cache(maxsize=None)
+def corpus_catalog():
+    """
+    Returns the catalog shared by every session of this Streamlit process. It is opened on
+    first use, so importing this module creates no files.
+    """
+    return CorpusCatalog()
@@ -0,0 +1,148 @@
+import os
+import glob
+import json
+import time
+import uuid
+import zlib
+import weakref
+from collections import deque
+from utils.constants import CHAT_HISTORY_DIRECTORY, CHAT_HISTORY_MEMORY_BYTES, CHAT_HISTORY_SPILL_TO_DISK, CHAT_HISTORY_MAX_AGE
+
+def encode_message(role, content):
+    """
+    Returns a message as compressed JSON.
+    """
+    return zlib.compress(json.dumps({"role": role, "content": content}).encode("utf-8"))
+
+def decode_message(blob):
+    return json.loads(zlib.decompress(blob))
+
+def remove_file(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+class ChatHistory:
+    """
+    Chat history of one session, stored compactly with a cap on the memory it may use.
+
+    Messages are kept zlib-compressed. Once they take more than memory_bytes, the oldest
+    are moved to an append-only file on disk and only their offsets stay in memory; with
+    spill_to_disk off they are dropped instead. Rendering reads a window of recent messages,
+    so its cost does not grow with the length of the conversation.
+    """
+
+    def __init__(self, memory_bytes=CHAT_HISTORY_MEMORY_BYTES, spill_to_disk=CHAT_HISTORY_SPILL_TO_DISK, directory=CHAT_HISTORY_DIRECTORY):
+        self.memory_bytes = memory_bytes
+        self.spill_to_disk = spill_to_disk
+        self.directory = directory
+        self._reset()
+
+    def _reset(self):
+        self.dropped = 0
+        self._recent = deque()
+        self._recent_bytes = 0
+        self._offsets = []
+        self._path = None
+        self._finalizer = None
+
+    def __len__(self):
+        return self.dropped + len(self._offsets) + len(self._recent)
+
+    def _spill(self):
+        """
+        Moves the oldest in-memory messages to disk, or drops them, until the rest fit in memory_bytes.
+        The latest message always stays in memory.
+        """
+        spilled = []
+        while self._recent_bytes > self.memory_bytes and len(self._recent) > 1:
+            blob = self._recent.popleft()
+            self._recent_bytes -= len(blob)
+            spilled.append(blob)
+
+        if not spilled:
+            return
+        if not self.spill_to_disk:
+            self.dropped += len(spilled)
+            return
+
+        if self._path is None:
+            os.makedirs(self.directory, exist_ok=True)
+            self._path = os.path.join(self.directory, f"{uuid.uuid4().hex}.chat")
+            # Sessions are dropped without notice, so the file goes when the history is garbage collected
+            self._finalizer = weakref.finalize(self, remove_file, self._path)
+
+        with open(self._path, "ab") as f:
+            for blob in spilled:
+                self._offsets.append((f.tell(), len(blob)))
+                f.write(blob)
+
+    def append(self, role, content):
+        """
+        Adds a message to the end of the history.
+        """
+        blob = encode_message(role, content)
+        self._recent.append(blob)
+        self._recent_bytes += len(blob)
+        self._spill()
+
+    def window(self, start, stop):
+        """
+        Returns messages start..stop-1 as {"role", "content"} dicts. Dropped messages are skipped.
+        """
+        start, stop = max(start, self.dropped), min(stop, len(self))
+        messages = []
+        on_disk = len(self._offsets)
+        disk_stop = min(stop - self.dropped, on_disk)
+        if start - self.dropped < disk_stop:
+            try:
+                with open(self._path, "rb") as f:
+                    for offset, size in self._offsets[start - self.dropped:disk_stop]:
+                        f.seek(offset)
+                        messages.append(decode_message(f.read(size)))
+            except FileNotFoundError:
+                # The file of a session idle for longer than CHAT_HISTORY_MAX_AGE was swept
+                self.dropped += on_disk
+                self._offsets, self._path, self._finalizer = [], None, None
+                return self.window(start, stop)
+
+        first_recent = self.dropped + on_disk
+        for index in range(max(start, first_recent), stop):
+            messages.append(decode_message(self._recent[index - first_recent]))
+        return messages
+
+    def recent(self, count):
+        """
+        Returns the last count messages.
+        """
+        return self.window(len(self) - count, len(self))
+
+    def clear(self):
+        """
+        Removes every message and deletes the spill file.
+        """
+        if self._finalizer is not None:
+            self._finalizer()
+        self._reset()
+
+    def stats(self):
+        """
+        Returns the number of messages and where they are kept.
+        """
+        return {
+            "messages": len(self),
+            "in_memory": len(self._recent),
+            "memory_bytes": self._recent_bytes,
+            "on_disk": len(self._offsets),
+            "dropped": self.dropped,
+        }
+
+def sweep_chat_histories(max_age=CHAT_HISTORY_MAX_AGE, directory=CHAT_HISTORY_DIRECTORY):
+    """
+    Deletes spill files of sessions that ended when the process was killed.
+    """
+    now = time.time()
+    for path in glob.glob(os.path.join(directory, "*.chat")):
+        if now - os.path.getmtime(path) > max_age:
+            remove_file(path)
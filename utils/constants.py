@@ -1,13 +1,90 @@
 CHUNK_SIZE = 1000
 CHUNK_OVERLAP = 200
-SIMILAR_DOCUMENTS = 10
+SIMILAR_DOCUMENTS = 6
+HYBRID_FETCH_K = 20
+RRF_K = 60
+RERANKER = "lexical"
+RERANK_DEPTH = 20
+RERANK_BATCH_SIZE = 16
+RERANK_LATENCY_BUDGET = 0.2
+CROSS_ENCODER_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+CONTEXT_TOKEN_BUDGET = 1500
+CHARS_PER_TOKEN = 4
+CONTEXT_NEIGHBOR_SENTENCES = 1
+CONTEXT_MIN_OVERLAP_CHARS = 20
+STREAM_WINDOW_CHUNKS = 4
+EMBEDDING_BATCH_SIZE = 200
+DEDUP_SIMILARITY_THRESHOLD = 0.9
+DEDUP_SHINGLE_WORDS = 5
+DEDUP_NUM_PERMUTATIONS = 128
+DEDUP_BANDS = 32
 EMBEDDING_MODEL = "models/embedding-001"
 LLM_MODEL = "gemini-1.5-flash"
 
+EMBEDDING_CACHE_PATH = "embedding_cache.sqlite3"
+EMBEDDING_CACHE_MAX_ENTRIES = 100000
+
+EMBEDDING_REQUEST_BATCH_SIZE = 50
+EMBEDDING_MAX_IN_FLIGHT = 4
+EMBEDDING_REQUESTS_PER_SECOND = 5.0
+EMBEDDING_MAX_RETRIES = 5
+EMBEDDING_BACKOFF_SECONDS = 1.0
+
+VECTORSTORE_BACKEND = "chroma"
+QUANTIZED_SEARCH_BLOCK_ROWS = 65536
+QUANTIZED_RERANK_FACTOR = 8
+
+VECTORSTORE_DIRECTORY = "vectorstores"
+CATALOG_PATH = "vectorstores/catalog.sqlite3"
+VECTORSTORE_DISK_QUOTA_MB = 2048
+ORPHAN_GRACE_SECONDS = 3600
+
+SHARED_CORPUS_IDLE_TTL = 600
+MAX_IDLE_SHARED_CORPORA = 4
+
+ANSWER_CACHE_SIMILARITY = 0.95
+ANSWER_CACHE_TTL = 3600
+ANSWER_CACHE_MAX_ENTRIES = 1000
+
+TRACE_BUFFER_SIZE = 2000
+
 FILE_EXTENSION_OPTIONS = ["pdf", "docx", "txt", "pptx", "xlsx"]
 MAX_NO_OF_YOUTUBE_URL = 3
 MAX_NO_OF_WEBSITE_URL = 5
-FILE_UPLOAD_DIRECTORY = "uploads"
+
+CRAWL_CACHE_PATH = "crawl_cache.sqlite3"
+CRAWL_MAX_DEPTH = 2
+CRAWL_MAX_PAGES = 50
+CRAWL_MAX_CONNECTIONS = 16
+CRAWL_PER_HOST_CONCURRENCY = 4
+CRAWL_DELAY_SECONDS = 0.25
+CRAWL_TIMEOUT_SECONDS = 30
+CRAWL_USER_AGENT = "RAGify-Crawler"
+UPLOAD_SPILL_DIRECTORY = "uploads"
+UPLOAD_SPILL_MAX_AGE = 3600
+# Uploads cheap enough to parse on a thread straight from memory, without a spill file
+IN_MEMORY_UPLOAD_EXTENSIONS = (".txt", ".docx")
+
+BATCH_QUERY_SIZE = 32
+BATCH_QUERY_CONCURRENCY = 8
+
+PDF_PAGE_CACHE_PATH = "pdf_page_cache.sqlite3"
+PDF_PAGE_CACHE_MAX_DOCUMENTS = 500
+PDF_EXTRACT_WORKERS = 4
+PDF_PAGES_PER_TASK = 64
+PDF_PARALLEL_MIN_PAGES = 128
+
+MAX_PARSE_WORKERS = 4
+MAX_FETCH_WORKERS = 8
+INGESTION_JOB_WORKERS = 2
+JOB_RETENTION_SECONDS = 3600
+JOB_POLL_SECONDS = 1
+
+CHAT_HISTORY_WINDOW_TURNS = 10
+CHAT_HISTORY_MEMORY_BYTES = 256 * 1024
+CHAT_HISTORY_SPILL_TO_DISK = True
+CHAT_HISTORY_DIRECTORY = "chat_history"
+CHAT_HISTORY_MAX_AGE = 24 * 3600
 
 CHAT_USER_ICON = "🧑"
 CHAT_AI_ICON = "🤖"
\ No newline at end of file
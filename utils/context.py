@@ -0,0 +1,136 @@
+import re
+import math
+from langchain_core.documents import Document
+from utils.keyword_index import tokenize
+from utils.tracing import trace
+from utils.constants import CONTEXT_TOKEN_BUDGET, CHARS_PER_TOKEN, CONTEXT_NEIGHBOR_SENTENCES, CONTEXT_MIN_OVERLAP_CHARS
+
+SENTENCE_PATTERN = re.compile(r"(?<=[.!?])\s+|\n+")
+
+# Question words that say nothing about which sentences are relevant
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "did", "do", "does", "for", "from", "how",
+    "i", "in", "is", "it", "me", "of", "on", "or", "tell", "that", "the", "this", "to", "was", "were",
+    "what", "when", "where", "which", "who", "why", "with", "you", "about", "there", "their",
+}
+
+def estimate_tokens(text):
+    """
+    Returns a rough token count of text, without calling a tokenizer.
+    """
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+def split_sentences(text):
+    """
+    Splits text into non-empty sentences.
+    """
+    return [sentence.strip() for sentence in SENTENCE_PATTERN.split(text) if sentence.strip()]
+
+def overlap_length(left, right, min_overlap=CONTEXT_MIN_OVERLAP_CHARS):
+    """
+    Returns the length of the longest suffix of left that is also a prefix of right,
+    or 0 if it is shorter than min_overlap characters.
+    """
+    window = min(len(left), len(right))
+    if window < min_overlap:
+        return 0
+
+    # Prefix function of right's head + separator + left's tail: its last value is the overlap
+    text = right[:window] + "\x00" + left[-window:]
+    failure = [0] * len(text)
+    for i in range(1, len(text)):
+        k = failure[i - 1]
+        while k and text[i] != text[k]:
+            k = failure[k - 1]
+        if text[i] == text[k]:
+            k += 1
+        failure[i] = k
+    return failure[-1] if failure[-1] >= min_overlap else 0
+
+def trim_overlaps(documents, min_overlap=CONTEXT_MIN_OVERLAP_CHARS):
+    """
+    Returns the texts of the documents with the text they share with a better ranked
+    document of the same source cut off. Adjacent chunks of a source repeat up to
+    chunk_overlap characters at their boundary, often starting mid-sentence.
+    """
+    texts = [document.page_content for document in documents]
+    by_source = {}
+    for index, document in enumerate(documents):
+        earlier = by_source.setdefault(document.metadata.get("source"), [])
+        for other in earlier:
+            # This chunk may follow the other one in the source, or precede it
+            other_text = documents[other].page_content
+            texts[index] = texts[index][overlap_length(other_text, texts[index], min_overlap):]
+            tail = overlap_length(texts[index], other_text, min_overlap)
+            if tail:
+                texts[index] = texts[index][:-tail]
+        earlier.append(index)
+    return texts
+
+def compress_context(question, documents, token_budget=CONTEXT_TOKEN_BUDGET, neighbors=CONTEXT_NEIGHBOR_SENTENCES, rescore=True):
+    """
+    Assembles the retrieved documents into a context of at most token_budget tokens.
+
+    Documents are re-scored against the question by the IDF-weighted question terms their
+    sentences contain, plus a small prior for their retrieval rank. From each document only
+    the sentences mentioning question terms are kept, with neighbors sentences around them;
+    a document without any is kept whole but ranked last. Text a document shares at its
+    boundary with a better ranked chunk of the same source is trimmed before sentences are
+    selected, and sentences already taken from an earlier document are skipped. The budget is then filled greedily from the best document down.
+    Pass rescore=False to keep the given order, e.g. when the documents were already reranked.
+    Returns the compressed documents, best first, with their original metadata.
+    """
+    with trace("context_compression") as attributes:
+        question_terms = {term for term in tokenize(question) if term not in STOPWORDS}
+        sentences = [split_sentences(text) for text in trim_overlaps(documents)]
+        sentence_terms = [[set(tokenize(sentence)) & question_terms for sentence in doc_sentences] for doc_sentences in sentences]
+
+        # Terms found in every retrieved sentence do not separate relevant sentences from others
+        total = sum(len(doc_terms) for doc_terms in sentence_terms) or 1
+        frequency = {}
+        for doc_terms in sentence_terms:
+            for terms in doc_terms:
+                for term in terms:
+                    frequency[term] = frequency.get(term, 0) + 1
+        idf = {term: math.log(1 + total / count) for term, count in frequency.items()}
+
+        candidates = []
+        for rank, (document, doc_sentences, doc_terms) in enumerate(zip(documents, sentences, sentence_terms)):
+            scores = [sum(idf[term] for term in terms) for terms in doc_terms]
+            relevant = [index for index, score in enumerate(scores) if score > 0]
+            if relevant:
+                selected = sorted({
+                    neighbor
+                    for index in relevant
+                    for neighbor in range(max(0, index - neighbors), min(len(doc_sentences), index + neighbors + 1))
+                })
+            else:
+                selected = range(len(doc_sentences))
+            score = sum(scores) + 1.0 / (rank + 1)
+            candidates.append((score, rank, document, [doc_sentences[index] for index in selected]))
+
+        if rescore:
+            candidates.sort(key=lambda candidate: (-candidate[0], candidate[1]))
+
+        remaining = token_budget
+        seen = set()
+        compressed = []
+        for score, rank, document, selected in candidates:
+            kept = []
+            for sentence in selected:
+                key = " ".join(sentence.lower().split())
+                tokens = estimate_tokens(sentence)
+                if key in seen or tokens > remaining:
+                    continue
+                seen.add(key)
+                kept.append(sentence)
+                remaining -= tokens
+            if kept:
+                compressed.append(Document(id=document.id, page_content=" ".join(kept), metadata=document.metadata))
+
+        attributes["documents"] = len(documents)
+        attributes["kept_documents"] = len(compressed)
+        attributes["tokens_before"] = sum(estimate_tokens(document.page_content) for document in documents)
+        attributes["tokens_after"] = token_budget - remaining
+
+    return compressed
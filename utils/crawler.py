@@ -0,0 +1,216 @@
+import json
+import time
+import asyncio
+import sqlite3
+import aiohttp
+from urllib.parse import urljoin, urldefrag, urlparse
+from urllib.robotparser import RobotFileParser
+from bs4 import BeautifulSoup
+from utils.constants import (
+    CRAWL_CACHE_PATH,
+    CRAWL_MAX_DEPTH,
+    CRAWL_MAX_PAGES,
+    CRAWL_MAX_CONNECTIONS,
+    CRAWL_PER_HOST_CONCURRENCY,
+    CRAWL_DELAY_SECONDS,
+    CRAWL_TIMEOUT_SECONDS,
+    CRAWL_USER_AGENT,
+)
+
+# Elements that hold navigation, scripts and layout rather than page content
+BOILERPLATE_TAGS = ["script", "style", "noscript", "svg", "nav", "header", "footer", "aside", "form", "iframe"]
+
+def extract_page(html, url):
+    """
+    Returns (title, text, links) of an HTML page, with boilerplate removed from the text.
+    Text is taken from <main> or <article> when the page has one.
+    """
+    soup = BeautifulSoup(html, "lxml")
+    links = [urljoin(url, anchor["href"]) for anchor in soup.find_all("a", href=True)]
+    title = soup.title.get_text(strip=True) if soup.title else url
+
+    for element in soup(BOILERPLATE_TAGS):
+        element.decompose()
+    body = soup.find("main") or soup.find("article") or soup.body or soup
+    lines = (line.strip() for line in body.get_text("\n").splitlines())
+    return title, "\n".join(line for line in lines if line), links
+
+def normalize_url(url):
+    """
+    Drops the fragment of a URL so every page is fetched once.
+    """
+    return urldefrag(url)[0]
+
+class CrawlCache:
+    """
+    SQLite store of each crawled page's validators, extracted text and links, so a
+    re-crawl sends conditional requests and reuses pages the server reports unchanged.
+    """
+
+    def __init__(self, path=CRAWL_CACHE_PATH):
+        self._conn = sqlite3.connect(path)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            "url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, title TEXT NOT NULL, text TEXT NOT NULL, links TEXT NOT NULL, fetched REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, url):
+        row = self._conn.execute("SELECT etag, last_modified, title, text, links FROM pages WHERE url = ?", (url,)).fetchone()
+        if row is None:
+            return None
+        etag, last_modified, title, text, links = row
+        return {"etag": etag, "last_modified": last_modified, "title": title, "text": text, "links": json.loads(links)}
+
+    def put(self, url, etag, last_modified, title, text, links):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (url, etag, last_modified, title, text, json.dumps(links), time.time()),
+        )
+        self._conn.commit()
+
+    def close(self):
+        self._conn.close()
+
+class HostPolicy:
+    """
+    robots.txt rules and politeness limits of one host: at most CRAWL_PER_HOST_CONCURRENCY
+    requests at a time, started at least delay seconds apart (or the host's Crawl-delay).
+    """
+
+    def __init__(self, robots, delay, concurrency):
+        self.robots = robots
+        crawl_delay = robots.crawl_delay(CRAWL_USER_AGENT) if robots is not None else None
+        self.delay = max(delay, float(crawl_delay or 0))
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.next_request = 0.0
+        self._lock = asyncio.Lock()
+
+    def allowed(self, url):
+        return self.robots is None or self.robots.can_fetch(CRAWL_USER_AGENT, url)
+
+    async def wait_turn(self):
+        async with self._lock:
+            now = time.monotonic()
+            wait = self.next_request - now
+            self.next_request = max(now, self.next_request) + self.delay
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+class Crawler:
+    """
+    Breadth-first crawler of the pages of one site, starting from a seed URL.
+
+    Only pages on the seed's host, within max_depth links of the seed and allowed by
+    robots.txt are fetched, at most max_pages of them. Pages are fetched concurrently
+    over one pooled aiohttp session, with per-host politeness limits. Pages already in
+    the cache are requested with If-None-Match / If-Modified-Since, and a 304 reuses the
+    cached text and links without downloading or parsing the page again.
+    """
+
+    def __init__(
+        self,
+        max_depth=CRAWL_MAX_DEPTH,
+        max_pages=CRAWL_MAX_PAGES,
+        max_connections=CRAWL_MAX_CONNECTIONS,
+        per_host_concurrency=CRAWL_PER_HOST_CONCURRENCY,
+        delay=CRAWL_DELAY_SECONDS,
+        cache_path=CRAWL_CACHE_PATH,
+    ):
+        self.max_depth = max_depth
+        self.max_pages = max_pages
+        self.max_connections = max_connections
+        self.per_host_concurrency = per_host_concurrency
+        self.delay = delay
+        self.cache_path = cache_path
+
+    async def _robots(self, session, origin):
+        robots = RobotFileParser()
+        try:
+            async with session.get(f"{origin}/robots.txt") as response:
+                # Access denied or a server error disallows everything, a missing file allows everything
+                if response.status in (401, 403) or response.status >= 500:
+                    robots.disallow_all = True
+                    return robots
+                if response.status >= 400:
+                    return None
+                robots.parse((await response.text()).splitlines())
+        except aiohttp.ClientError:
+            return None
+        return robots
+
+    async def _fetch(self, session, policy, cache, url):
+        """
+        Fetches one page and returns its page dict, or None if it is not an HTML page or
+        redirects off the host or to a path robots.txt disallows.
+        """
+        cached = cache.get(url)
+        headers = {}
+        if cached is not None and cached["etag"]:
+            headers["If-None-Match"] = cached["etag"]
+        if cached is not None and cached["last_modified"]:
+            headers["If-Modified-Since"] = cached["last_modified"]
+
+        async with policy.semaphore:
+            await policy.wait_turn()
+            async with session.get(url, headers=headers) as response:
+                if response.status == 304 and cached is not None:
+                    return {"url": url, "title": cached["title"], "text": cached["text"], "links": cached["links"], "changed": False}
+                if response.status >= 400 or "html" not in response.headers.get("Content-Type", ""):
+                    return None
+                final_url = str(response.url)
+                if urlparse(final_url).netloc != urlparse(url).netloc or not policy.allowed(final_url):
+                    return None
+                html = await response.text()
+                etag, last_modified = response.headers.get("ETag"), response.headers.get("Last-Modified")
+
+        title, text, links = extract_page(html, final_url)
+        cache.put(url, etag, last_modified, title, text, links)
+        return {"url": url, "title": title, "text": text, "links": links, "changed": True}
+
+    async def crawl(self, seed):
+        """
+        Crawls from seed and returns the pages found, in crawl order. Each page is a dict
+        with url, title, text, links and changed (False if the server reported it unchanged).
+        """
+        seed = normalize_url(seed)
+        host = urlparse(seed).netloc
+        origin = f"{urlparse(seed).scheme}://{host}"
+        cache = CrawlCache(self.cache_path)
+        pages = []
+
+        connector = aiohttp.TCPConnector(limit=self.max_connections, limit_per_host=self.per_host_concurrency)
+        timeout = aiohttp.ClientTimeout(total=CRAWL_TIMEOUT_SECONDS)
+        try:
+            async with aiohttp.ClientSession(connector=connector, timeout=timeout, headers={"User-Agent": CRAWL_USER_AGENT}) as session:
+                policy = HostPolicy(await self._robots(session, origin), self.delay, self.per_host_concurrency)
+                seen = {seed}
+                frontier = [seed]
+
+                for depth in range(self.max_depth + 1):
+                    frontier = [url for url in frontier if policy.allowed(url)][:self.max_pages - len(pages)]
+                    if not frontier:
+                        break
+
+                    results = await asyncio.gather(*(self._fetch(session, policy, cache, url) for url in frontier), return_exceptions=True)
+                    next_frontier = []
+                    for result in results:
+                        if result is None or isinstance(result, Exception):
+                            continue
+                        pages.append(result)
+                        for link in result["links"]:
+                            link = normalize_url(link)
+                            if urlparse(link).netloc == host and urlparse(link).scheme in ("http", "https") and link not in seen:
+                                seen.add(link)
+                                next_frontier.append(link)
+                    frontier = next_frontier
+        finally:
+            cache.close()
+
+        return pages
+
+def crawl_site(seed, **kwargs):
+    """
+    Crawls a site from a seed URL and returns its pages; see Crawler.
+    """
+    return asyncio.run(Crawler(**kwargs).crawl(seed))
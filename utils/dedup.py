@@ -0,0 +1,100 @@
+import re
+import zlib
+import hashlib
+import numpy as np
+from utils.tracing import trace
+from utils.constants import (
+    DEDUP_SIMILARITY_THRESHOLD,
+    DEDUP_SHINGLE_WORDS,
+    DEDUP_NUM_PERMUTATIONS,
+    DEDUP_BANDS,
+)
+
+# Universal hashing (a * x + b) mod p over 32-bit shingle hashes; a < 2^31 keeps a * x + b inside uint64
+_MERSENNE_PRIME = np.uint64(4294967311)
+
+def normalize_text(text):
+    """
+    Lowercases text and collapses whitespace, so formatting differences do not hide duplicates.
+    """
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+def shingle_hashes(text, shingle_words=DEDUP_SHINGLE_WORDS):
+    """
+    Returns the distinct 32-bit hashes of the word shingles of a normalized text.
+    """
+    words = text.split(" ")
+    if len(words) <= shingle_words:
+        shingles = [text]
+    else:
+        shingles = [" ".join(words[i:i + shingle_words]) for i in range(len(words) - shingle_words + 1)]
+    return np.unique(np.fromiter((zlib.crc32(shingle.encode("utf-8")) for shingle in shingles), dtype=np.uint64))
+
+def permutations(num_permutations=DEDUP_NUM_PERMUTATIONS, seed=1):
+    """
+    Returns the fixed (a, b) coefficients of the MinHash permutations. A fixed seed keeps
+    signatures, and therefore which chunks are dropped, identical across runs.
+    """
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, 2 ** 31, size=num_permutations, dtype=np.uint64)
+    b = rng.integers(0, 2 ** 32, size=num_permutations, dtype=np.uint64)
+    return a, b
+
+def minhash_signature(hashes, a, b):
+    """
+    Returns the MinHash signature of a set of shingle hashes.
+    """
+    return ((a[:, None] * hashes[None, :] + b[:, None]) % _MERSENNE_PRIME).min(axis=1)
+
+def deduplicate_chunks(
+    chunks,
+    threshold=DEDUP_SIMILARITY_THRESHOLD,
+    shingle_words=DEDUP_SHINGLE_WORDS,
+    num_permutations=DEDUP_NUM_PERMUTATIONS,
+    bands=DEDUP_BANDS,
+):
+    """
+    Drops exact and near-duplicate chunks and returns (kept chunks, report).
+
+    Chunks are only compared with chunks of the same source (their "source" metadata),
+    since sources are removed from a corpus one at a time: a chunk dropped as a copy of
+    another source's chunk would be lost with that source. Exact duplicates are found by hashing the normalized text. Near duplicates are chunks
+    whose estimated Jaccard similarity of word shingles with an earlier kept chunk is at
+    least threshold; candidates are found with MinHash and LSH banding, so each chunk is
+    only compared with the few chunks sharing a band with it. The first occurrence is kept.
+    The report counts the total, exact, near and kept chunks.
+    """
+    a, b = permutations(num_permutations)
+    rows = num_permutations // bands
+    seen = set()
+    buckets = {}
+    signatures = []
+    kept = []
+    report = {"total": len(chunks), "exact": 0, "near": 0, "kept": 0}
+
+    with trace("dedup") as attributes:
+        for chunk in chunks:
+            source = chunk.metadata.get("source")
+            text = normalize_text(chunk.page_content)
+            digest = (source, hashlib.sha1(text.encode("utf-8")).digest())
+            if digest in seen:
+                report["exact"] += 1
+                continue
+
+            signature = minhash_signature(shingle_hashes(text, shingle_words), a, b)
+            keys = [(source, band, signature[band * rows:(band + 1) * rows].tobytes()) for band in range(bands)]
+            candidates = {index for key in keys for index in buckets.get(key, ())}
+            if any(np.mean(signatures[index] == signature) >= threshold for index in candidates):
+                report["near"] += 1
+                continue
+
+            seen.add(digest)
+            for key in keys:
+                buckets.setdefault(key, []).append(len(signatures))
+            signatures.append(signature)
+            kept.append(chunk)
+
+        report["kept"] = len(kept)
+        attributes.update(report)
+
+    return kept, report
@@ -0,0 +1,168 @@
+import time
+import sqlite3
+import hashlib
+import threading
+from array import array
+from collections import OrderedDict
+from langchain_core.embeddings import Embeddings
+from utils.tracing import trace
+from utils.constants import EMBEDDING_MODEL, EMBEDDING_CACHE_PATH, EMBEDDING_CACHE_MAX_ENTRIES
+
+# SQLite caps the number of bound parameters per statement
+LOOKUP_BATCH_SIZE = 500
+
+# Number of recent query embeddings kept in memory
+RECENT_QUERIES = 256
+
+def embedding_key(text, model=EMBEDDING_MODEL):
+    """
+    Returns the content address of a chunk for the given embedding model.
+    """
+    return hashlib.sha256(f"{model}\x00{text}".encode("utf-8")).hexdigest()
+
+class CachedEmbeddings(Embeddings):
+    """
+    Persistent, size-bounded cache in front of an embedding model.
+
+    Vectors are stored in SQLite keyed by sha256(model + chunk text), so the same
+    chunk is only embedded once no matter which session or upload produced it.
+    The least recently used entries are evicted once max_entries is exceeded.
+    """
+
+    def __init__(self, embeddings, model=EMBEDDING_MODEL, cache_path=EMBEDDING_CACHE_PATH, max_entries=EMBEDDING_CACHE_MAX_ENTRIES):
+        self.embeddings = embeddings
+        self.model = model
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._recent_queries = OrderedDict()
+        self._conn = sqlite3.connect(cache_path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+        self._conn.commit()
+
+    def _lookup(self, keys):
+        """
+        Fetches cached vectors for the given keys in batches and marks them as recently used.
+        """
+        found = {}
+        unique_keys = list(dict.fromkeys(keys))
+        now = time.time()
+        with self._lock:
+            for start in range(0, len(unique_keys), LOOKUP_BATCH_SIZE):
+                batch = unique_keys[start:start + LOOKUP_BATCH_SIZE]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = array("f", blob).tolist()
+                if rows:
+                    self._conn.execute(
+                        f"UPDATE embeddings SET last_used = ? WHERE key IN ({placeholders})", [now, *batch]
+                    )
+            self._conn.commit()
+        return found
+
+    def _store(self, items):
+        """
+        Writes newly computed vectors and evicts the least recently used entries over the limit.
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+                [(key, array("f", vector).tobytes(), now) for key, vector in items.items()],
+            )
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+            if count > self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE key IN (SELECT key FROM embeddings ORDER BY last_used ASC LIMIT ?)",
+                    (count - self.max_entries,),
+                )
+            self._conn.commit()
+
+    def store_texts(self, texts, vectors):
+        """
+        Caches already computed vectors for the texts, e.g. each batch as an embedding engine completes it.
+        """
+        self._store({embedding_key(text, self.model): vector for text, vector in zip(texts, vectors)})
+
+    def embed_documents(self, texts):
+        """
+        Embeds the texts, only calling the wrapped model for chunks that are not cached yet.
+        """
+        with trace("embedding", texts=len(texts)) as attributes:
+            keys = [embedding_key(text, self.model) for text in texts]
+            cached = self._lookup(keys)
+
+            missing = {}
+            for key, text in zip(keys, texts):
+                if key not in cached and key not in missing:
+                    missing[key] = text
+
+            self.hits += len(texts) - len(missing)
+            self.misses += len(missing)
+            attributes["cache_hits"] = len(texts) - len(missing)
+            attributes["cache_misses"] = len(missing)
+
+            if missing:
+                vectors = self.embeddings.embed_documents(list(missing.values()))
+                computed = dict(zip(missing.keys(), vectors))
+                self._store(computed)
+                cached.update(computed)
+
+        return [cached[key] for key in keys]
+
+    def embed_query(self, text):
+        """
+        Embeds a search query. Recent queries are memoized in memory only, so the answer
+        cache and the retriever can both embed a question for a single model call.
+        """
+        with self._lock:
+            if text in self._recent_queries:
+                self._recent_queries.move_to_end(text)
+                return self._recent_queries[text]
+
+        vector = self.embeddings.embed_query(text)
+        with self._lock:
+            self._recent_queries[text] = vector
+            while len(self._recent_queries) > RECENT_QUERIES:
+                self._recent_queries.popitem(last=False)
+        return vector
+
+    def embed_queries(self, texts):
+        """
+        Embeds many search queries at once, sharing the memo of embed_query. The wrapped model
+        embeds them in batches when it supports it, otherwise one by one.
+        """
+        with self._lock:
+            vectors = {text: self._recent_queries[text] for text in texts if text in self._recent_queries}
+        missing = list(dict.fromkeys(text for text in texts if text not in vectors))
+
+        if missing:
+            embed_queries = getattr(self.embeddings, "embed_queries", None)
+            computed = embed_queries(missing) if embed_queries is not None else [self.embeddings.embed_query(text) for text in missing]
+            with self._lock:
+                for text, vector in zip(missing, computed):
+                    vectors[text] = self._recent_queries[text] = vector
+                while len(self._recent_queries) > RECENT_QUERIES:
+                    self._recent_queries.popitem(last=False)
+        return [vectors[text] for text in texts]
+
+    def stats(self):
+        """
+        Returns the hit/miss counters and the current number of cached vectors.
+        """
+        with self._lock:
+            (size,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": size,
+        }
@@ -0,0 +1,142 @@
+import time
+import random
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from langchain_core.embeddings import Embeddings
+from utils.tracing import record
+from utils.constants import (
+    EMBEDDING_REQUEST_BATCH_SIZE,
+    EMBEDDING_MAX_IN_FLIGHT,
+    EMBEDDING_REQUESTS_PER_SECOND,
+    EMBEDDING_MAX_RETRIES,
+    EMBEDDING_BACKOFF_SECONDS,
+)
+
+class TokenBucket:
+    """
+    Token-bucket rate limiter shared by every event loop and thread of the process.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self):
+        """
+        Takes a token and returns how long the caller must wait before using it.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    async def acquire(self):
+        wait = self._reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+class EmbeddingBatchError(Exception):
+    """
+    Raised when some batches could not be embedded after all retries.
+    The batches that succeeded have already been passed to on_batch.
+    """
+
+class BatchEmbeddingEngine(Embeddings):
+    """
+    Embeds documents in fixed-size batches with a bounded number of concurrent requests,
+    token-bucket rate limiting and exponential-backoff retries per batch.
+
+    Every completed batch is handed to on_batch(texts, vectors) as soon as it arrives,
+    so a caller such as the embedding cache can persist progress and a failed run
+    resumes from the batches that were already embedded.
+    """
+
+    def __init__(
+        self,
+        embeddings,
+        batch_size=EMBEDDING_REQUEST_BATCH_SIZE,
+        max_in_flight=EMBEDDING_MAX_IN_FLIGHT,
+        requests_per_second=EMBEDDING_REQUESTS_PER_SECOND,
+        max_retries=EMBEDDING_MAX_RETRIES,
+        backoff_seconds=EMBEDDING_BACKOFF_SECONDS,
+        on_batch=None,
+    ):
+        self.embeddings = embeddings
+        self.batch_size = batch_size
+        self.max_in_flight = max_in_flight
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.rate_limiter = TokenBucket(requests_per_second)
+        self.on_batch = on_batch
+        self.retries = 0
+        self.failed_batches = 0
+
+    async def _embed_queries(self, texts):
+        # Query vectors need the query task type, which only the synchronous client accepts
+        return await asyncio.to_thread(self.embeddings.embed_documents, texts, task_type="RETRIEVAL_QUERY")
+
+    async def _embed_batch(self, texts, semaphore, queries=False):
+        async with semaphore:
+            for attempt in range(self.max_retries + 1):
+                await self.rate_limiter.acquire()
+                start = time.perf_counter()
+                try:
+                    vectors = await (self._embed_queries(texts) if queries else self.embeddings.aembed_documents(texts))
+                except Exception:
+                    if attempt == self.max_retries:
+                        self.failed_batches += 1
+                        raise
+                    self.retries += 1
+                    # Exponential backoff with jitter, so throttled batches do not retry in lockstep
+                    await asyncio.sleep(self.backoff_seconds * 2 ** attempt * random.uniform(0.5, 1.5))
+                    continue
+
+                record("embedding_request", time.perf_counter() - start, texts=len(texts), attempt=attempt)
+                # Only document vectors are handed on, since on_batch persists them as chunk embeddings
+                if self.on_batch is not None and not queries:
+                    self.on_batch(texts, vectors)
+                return vectors
+
+    async def aembed_documents(self, texts, queries=False):
+        """
+        Embeds the texts batch by batch with at most max_in_flight requests at a time.
+        With queries, the texts are embedded as search queries rather than documents.
+        """
+        semaphore = asyncio.Semaphore(self.max_in_flight)
+        batches = [texts[start:start + self.batch_size] for start in range(0, len(texts), self.batch_size)]
+
+        # Let every batch finish before failing, so all successful batches reach on_batch
+        results = await asyncio.gather(*(self._embed_batch(batch, semaphore, queries) for batch in batches), return_exceptions=True)
+        errors = [result for result in results if isinstance(result, Exception)]
+        if errors:
+            raise EmbeddingBatchError(f"{len(errors)} of {len(batches)} embedding batches failed: {errors[0]}") from errors[0]
+
+        return [vector for vectors in results for vector in vectors]
+
+    def embed_documents(self, texts, queries=False):
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(self.aembed_documents(texts, queries))
+
+        # Called from inside an event loop, so run the batches on a loop of their own
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            return executor.submit(asyncio.run, self.aembed_documents(texts, queries)).result()
+
+    def embed_queries(self, texts):
+        """
+        Embeds many search queries in request batches, with the same limits as documents.
+        """
+        return self.embed_documents(texts, queries=True)
+
+    def embed_query(self, text):
+        return self.embeddings.embed_query(text)
+
+    async def aembed_query(self, text):
+        return await self.embeddings.aembed_query(text)
@@ -0,0 +1,146 @@
+import hashlib
+from itertools import islice
+from weakref import WeakKeyDictionary
+from utils.keyword_index import existing_keyword_index
+from utils.constants import EMBEDDING_BATCH_SIZE
+
+def chunk_id(source, offset, text):
+    """
+    Returns a stable ID for a chunk built from its source, its position in that source and its content.
+    """
+    content_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    return hashlib.sha256(f"{source}\x00{offset}\x00{content_hash}".encode("utf-8")).hexdigest()
+
+def assign_chunk_ids(chunks, offsets=None):
+    """
+    Stores a stable chunk_id in each chunk's metadata and returns the IDs in order.
+    Pass the same offsets dict when assigning IDs to consecutive batches of one stream.
+    """
+    offsets = {} if offsets is None else offsets
+    ids = []
+    for chunk in chunks:
+        source = chunk.metadata.get("source", "")
+        offset = offsets.get(source, 0)
+        offsets[source] = offset + 1
+
+        chunk.metadata["chunk_id"] = chunk_id(source, offset, chunk.page_content)
+        ids.append(chunk.metadata["chunk_id"])
+    return ids
+
+def source_chunk_ids(vectorstore, source):
+    """
+    Returns the IDs of every chunk stored for a source.
+    """
+    return vectorstore.get(where={"source": source}, include=[])["ids"]
+
+# Fingerprint of each vectorstore's current content, cleared whenever it changes
+_fingerprints = WeakKeyDictionary()
+
+def vectorstore_fingerprint(vectorstore):
+    """
+    Returns the corpus fingerprint of the vectorstore's current content.
+    """
+    fingerprint = _fingerprints.get(vectorstore)
+    if fingerprint is None:
+        fingerprint = corpus_fingerprint(vectorstore.get(include=[])["ids"])
+        _fingerprints[vectorstore] = fingerprint
+    return fingerprint
+
+def add_chunks(vectorstore, ids, chunks):
+    """
+    Adds chunks to the vectorstore and to its keyword index, if one was built.
+    """
+    _fingerprints.pop(vectorstore, None)
+    vectorstore.add_documents(chunks, ids=ids)
+    keyword_index = existing_keyword_index(vectorstore)
+    if keyword_index is not None:
+        keyword_index.add(ids, [chunk.page_content for chunk in chunks], [chunk.metadata for chunk in chunks])
+
+def delete_chunks(vectorstore, ids):
+    """
+    Deletes chunks from the vectorstore and from its keyword index, if one was built.
+    """
+    _fingerprints.pop(vectorstore, None)
+    vectorstore.delete(ids=ids)
+    keyword_index = existing_keyword_index(vectorstore)
+    if keyword_index is not None:
+        keyword_index.remove(ids)
+
+def delete_sources(vectorstore, sources):
+    """
+    Removes every chunk of the given sources from the vectorstore and returns how many were deleted.
+    """
+    ids = []
+    for source in sources:
+        ids.extend(source_chunk_ids(vectorstore, source))
+    if ids:
+        delete_chunks(vectorstore, ids)
+    return len(ids)
+
+def upsert_chunks(vectorstore, chunks, batch_size=EMBEDDING_BATCH_SIZE, on_batch=None):
+    """
+    Adds only new or changed chunks to the vectorstore and returns (added, removed).
+
+    Chunks may be any iterable and are consumed batch_size at a time, so a chunk
+    generator flows straight into embedding without being materialized. Chunks already
+    stored under the same ID are skipped without being embedded again, and stored
+    chunks of a re-ingested source that no longer appear in it are deleted.
+    on_batch(processed) is called before every batch with the number of chunks already
+    processed; it may raise to abort the upsert.
+    """
+    offsets = {}
+    seen_ids = set()
+    added = 0
+    processed = 0
+
+    chunks = iter(chunks)
+    while batch := list(islice(chunks, batch_size)):
+        if on_batch is not None:
+            on_batch(processed)
+        processed += len(batch)
+
+        new_chunks = {}
+        for i, chunk in zip(assign_chunk_ids(batch, offsets), batch):
+            if i not in seen_ids:
+                new_chunks[i] = chunk
+                seen_ids.add(i)
+
+        if not new_chunks:
+            continue
+
+        existing_ids = set(vectorstore.get(ids=list(new_chunks), include=[])["ids"])
+        to_add = {i: chunk for i, chunk in new_chunks.items() if i not in existing_ids}
+        if to_add:
+            add_chunks(vectorstore, list(to_add), list(to_add.values()))
+            added += len(to_add)
+
+    stale_ids = []
+    for source in offsets:
+        stale_ids.extend(i for i in source_chunk_ids(vectorstore, source) if i not in seen_ids)
+    if stale_ids:
+        delete_chunks(vectorstore, stale_ids)
+
+    return added, len(stale_ids)
+
+def corpus_fingerprint(ids):
+    """
+    Returns a fingerprint identifying a corpus by the set of its chunk IDs.
+    """
+    return hashlib.sha256("\n".join(sorted(set(ids))).encode("utf-8")).hexdigest()
+
+def copy_vectorstore(vectorstore, target, batch_size=1000):
+    """
+    Copies every stored chunk with its embedding into another vectorstore without re-embedding.
+    Chunks are read and written batch_size at a time, so the copy never holds every embedding at once.
+    """
+    _fingerprints.pop(target, None)
+    # The quantized store takes embedded chunks directly, Chroma through its collection
+    add = getattr(target, "add_embeddings", None) or target._collection.add
+    offset = 0
+    while True:
+        stored = vectorstore.get(include=["documents", "metadatas", "embeddings"], limit=batch_size, offset=offset)
+        if not len(stored["ids"]):
+            break
+        add(ids=stored["ids"], embeddings=stored["embeddings"], metadatas=stored["metadatas"], documents=stored["documents"])
+        offset += len(stored["ids"])
+    return target
@@ -0,0 +1,209 @@
+import os
+import itertools
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from utils.dedup import deduplicate_chunks
+from utils.registry import open_corpus, update_corpus, reopen_corpus
+from utils.tracing import collect_spans, record_span
+from utils.catalog import file_fingerprint, url_fingerprint
+from utils.uploads import buffer_fingerprint, acquire_spill, release_spill
+from utils.lazy_imports import LazyRegistry
+from utils.constants import MAX_PARSE_WORKERS, MAX_FETCH_WORKERS, IN_MEMORY_UPLOAD_EXTENSIONS
+
+# CPU-bound parsers run in worker processes, network-bound loaders in threads;
+# each chunk_* function is only imported when a source of its kind is first ingested
+FILE_CHUNKERS = LazyRegistry({
+    ".pdf": "ragify:chunk_pdf",
+    ".docx": "ragify:chunk_word_doc",
+    ".pptx": "ragify:chunk_pptx",
+    ".txt": "ragify:chunk_txt_file",
+    ".xlsx": "ragify:chunk_excel",
+})
+URL_CHUNKERS = LazyRegistry({
+    "youtube": "ragify:chunk_youtube_video",
+    "website": "ragify:chunk_website",
+    "crawl": "ragify:chunk_site",
+})
+
+def file_source(file_path):
+    """
+    Describes an uploaded file to be ingested, fingerprinted by its content.
+    """
+    return {"kind": "file", "name": os.path.basename(file_path), "target": file_path, "fingerprint": file_fingerprint(file_path)}
+
+def upload_source(name, buffer):
+    """
+    Describes an uploaded file held in memory, e.g. UploadedFile.getbuffer(), to be
+    ingested without saving it first. It is fingerprinted by its content like file_source.
+    Formats in IN_MEMORY_UPLOAD_EXTENSIONS are parsed straight from the buffer; the others
+    are spilled once to a content-addressed file the parse workers read.
+    """
+    return {"kind": "file", "name": name, "target": name, "fingerprint": buffer_fingerprint(buffer), "data": buffer}
+
+def url_source(kind, url):
+    """
+    Describes a YouTube, website or website crawl URL to be ingested. Its fingerprint is only
+    known once its content has been fetched.
+    """
+    return {"kind": kind, "name": url, "target": url}
+
+def run_chunker(chunker, target):
+    """
+    Runs a chunk_* function and returns its chunks with the spans it recorded,
+    since spans recorded in a worker process never reach the app's ring buffer.
+    """
+    with collect_spans() as spans:
+        chunks = chunker(target)
+    return chunks, spans
+
+def parsed_in_memory(source):
+    """
+    Returns whether a source is an upload cheap enough to parse on a thread from its buffer.
+    """
+    return "data" in source and os.path.splitext(source["target"])[1].lower() in IN_MEMORY_UPLOAD_EXTENSIONS
+
+def submit_source(source, process_pool, thread_pool):
+    """
+    Submits the matching chunk_* function for a source to the right pool.
+    """
+    if source["kind"] == "file":
+        ext = os.path.splitext(source["target"])[1].lower()
+        if ext not in FILE_CHUNKERS:
+            raise ValueError(f"Unsupported file type: {ext}")
+        if "data" not in source:
+            return process_pool.submit(run_chunker, FILE_CHUNKERS[ext], source["target"])
+        # Spilling and a worker's start-up would cost more than parsing these
+        if parsed_in_memory(source):
+            return thread_pool.submit(run_chunker, FILE_CHUNKERS[ext], source["data"])
+
+        # Worker processes get a path to the upload instead of a pickled copy of it
+        path = acquire_spill(source["data"], source["fingerprint"], ext)
+        try:
+            future = process_pool.submit(run_chunker, FILE_CHUNKERS[ext], path)
+        except BaseException:
+            release_spill(path)
+            raise
+        # Runs when the worker finishes, fails or the future is cancelled
+        future.add_done_callback(lambda _: release_spill(path))
+        return future
+
+    return thread_pool.submit(run_chunker, URL_CHUNKERS[source["kind"]], source["target"])
+
+def iter_ingested_sources(sources, on_progress=None, max_parse_workers=MAX_PARSE_WORKERS, max_fetch_workers=MAX_FETCH_WORKERS):
+    """
+    Chunks all sources concurrently and yields (source, chunks, error) as each source finishes.
+    chunks is None for a failing source, which never affects the others.
+
+    A source's chunks are released once the consumer moves on, so a consumer that embeds
+    them before asking for the next source only holds the chunks of the sources that
+    finished meanwhile. on_progress(source, error, completed, total) is called from the
+    consuming thread as each source finishes, so it may update Streamlit widgets; it may
+    also raise to abort the remaining sources.
+    """
+    total = len(sources)
+    completed = 0
+
+    def report(source, error):
+        nonlocal completed
+        completed += 1
+        if on_progress is not None:
+            on_progress(source, error, completed, total)
+
+    with ProcessPoolExecutor(max_workers=max_parse_workers) as process_pool, ThreadPoolExecutor(max_workers=max_fetch_workers) as thread_pool:
+        futures = {}
+        try:
+            for source in sources:
+                try:
+                    futures[submit_source(source, process_pool, thread_pool)] = source
+                except Exception as e:
+                    report(source, e)
+                    yield source, None, e
+
+            for future in as_completed(list(futures)):
+                source = futures.pop(future)
+                try:
+                    chunks, spans = future.result()
+                except Exception as e:
+                    report(source, e)
+                    yield source, None, e
+                    continue
+
+                # Spans of worker processes are replayed here; thread spans are already recorded
+                if source["kind"] == "file" and not parsed_in_memory(source):
+                    for span in spans:
+                        record_span(span)
+
+                # Key every chunk by its source so the index can update or delete it later
+                for chunk in chunks:
+                    chunk.metadata["source"] = source["target"]
+
+                if source["kind"] != "file":
+                    source["fingerprint"] = url_fingerprint(source["target"], chunks)
+
+                report(source, None)
+                yield source, chunks, None
+        except BaseException:
+            # on_progress may raise to abort, e.g. when a job is cancelled; sources not started yet are dropped
+            for future in futures:
+                future.cancel()
+            raise
+
+def ingestion_job(job, sources, corpus, removed_sources, source_fingerprints):
+    """
+    Background job that chunks new sources and builds the session's next corpus.
+
+    The session's current corpus is never modified: changes are applied to a copy,
+    so the session keeps answering from the old index until it swaps in the returned
+    one. Sources are embedded as they are parsed; progress is reported on job per parsed
+    source, and a cancelled job stops before the next source or embedding batch.
+    Returns a dict with the new "corpus" lease (the old one if nothing changed),
+    "succeeded" and "failed" sources, "removed" sources, "dropped" duplicate chunks,
+    the updated source "fingerprints" and whether the corpus was "reopened" from disk.
+    """
+    fingerprints = dict(source_fingerprints)
+    result = {"corpus": corpus, "succeeded": [], "failed": [], "removed": list(removed_sources), "dropped": 0, "reopened": False}
+
+    # Files are fingerprinted by content, so a corpus persisted for exactly these files is reopened without parsing them
+    if corpus is None and sources and all(source["kind"] == "file" for source in sources):
+        file_fingerprints = {source["target"]: source["fingerprint"] for source in sources}
+        reopened = reopen_corpus(file_fingerprints)
+        if reopened is not None:
+            return {**result, "corpus": reopened, "succeeded": sources, "fingerprints": file_fingerprints, "reopened": True}
+
+    def on_progress(source, error, completed, total):
+        job.update("parsing", 0.9 * completed / total, f"Processed {completed}/{total}: {source['name']}")
+
+    def on_batch(processed):
+        job.update("embedding", None, f"Embedded {processed} chunks")
+
+    def stream():
+        # Each source's chunks are deduplicated and embedded as soon as it is parsed, so the
+        # corpus is never held at once; fingerprints is complete once the stream ends
+        for source, chunks, error in iter_ingested_sources(sources, on_progress=on_progress):
+            if error is not None:
+                result["failed"].append((source, error))
+                continue
+
+            # Drop boilerplate repeated within a source and near-identical pages before they are embedded
+            chunks, dedup_report = deduplicate_chunks(chunks)
+            result["dropped"] += dedup_report["exact"] + dedup_report["near"]
+            result["succeeded"].append(source)
+            fingerprints[source["target"]] = source["fingerprint"]
+            yield from chunks
+
+    for removed_source in removed_sources:
+        fingerprints.pop(removed_source, None)
+    result["fingerprints"] = fingerprints
+
+    job.update("parsing", 0.0, "Processing content...")
+    chunks = stream()
+    first = next(chunks, None)
+    if first is None and not removed_sources:
+        return result
+
+    chunks = itertools.chain([first] if first is not None else [], chunks)
+    if corpus is None:
+        result["corpus"] = open_corpus(chunks, fingerprints, on_batch=on_batch)
+    else:
+        result["corpus"] = update_corpus(corpus, chunks, removed_sources, fingerprints, on_batch=on_batch)
+
+    return result
@@ -0,0 +1,142 @@
+import time
+import uuid
+import queue
+import threading
+from utils.constants import INGESTION_JOB_WORKERS, JOB_RETENTION_SECONDS
+
+FINISHED_STATES = ("done", "failed", "cancelled")
+
+class JobCancelled(Exception):
+    """
+    Raised inside a job once its cancellation was requested.
+    """
+
+class Job:
+    """
+    A unit of background work and its status.
+
+    status moves from "queued" through the stages the job reports (e.g. "parsing",
+    "embedding") to "done", "failed" or "cancelled"; progress goes from 0 to 1.
+    The UI only reads these attributes, the worker thread only writes them.
+    """
+
+    def __init__(self, function, args):
+        self.id = uuid.uuid4().hex
+        self.function = function
+        self.args = args
+        self.status = "queued"
+        self.progress = 0.0
+        self.message = ""
+        self.result = None
+        self.error = None
+        self.finished_at = None
+        self._cancel = threading.Event()
+
+    @property
+    def finished(self):
+        return self.status in FINISHED_STATES
+
+    def update(self, status, progress=None, message=""):
+        """
+        Reports the job's current stage, raising JobCancelled if it was cancelled.
+        """
+        self.check_cancelled()
+        self.status = status
+        if progress is not None:
+            self.progress = progress
+        self.message = message
+
+    def cancel(self):
+        """
+        Requests cancellation. A queued job never starts; a running job stops at its next checkpoint.
+        """
+        self._cancel.set()
+
+    def check_cancelled(self):
+        if self._cancel.is_set():
+            raise JobCancelled()
+
+class JobQueue:
+    """
+    Runs jobs on a fixed number of daemon worker threads, oldest first.
+    Finished jobs are forgotten JOB_RETENTION_SECONDS after they end.
+    """
+
+    def __init__(self, workers=INGESTION_JOB_WORKERS):
+        self.workers = workers
+        self.jobs = {}
+        self._queue = queue.Queue()
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def submit(self, function, *args):
+        """
+        Queues function(job, *args) and returns its Job. The function's return value becomes job.result.
+        """
+        job = Job(function, args)
+        self.prune()
+        with self._lock:
+            self.jobs[job.id] = job
+
+            # Workers are started on first use, so importing this module starts no threads
+            while len(self._threads) < self.workers:
+                thread = threading.Thread(target=self._work, daemon=True, name=f"job-worker-{len(self._threads)}")
+                thread.start()
+                self._threads.append(thread)
+
+        self._queue.put(job)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self.jobs.get(job_id)
+
+    def prune(self):
+        """
+        Forgets jobs that finished more than JOB_RETENTION_SECONDS ago, with their results.
+        """
+        now = time.time()
+        with self._lock:
+            for job_id in [
+                job_id for job_id, old in self.jobs.items()
+                if old.finished and old.finished_at is not None and now - old.finished_at > JOB_RETENTION_SECONDS
+            ]:
+                self.jobs.pop(job_id).result = None
+
+    def discard(self, job):
+        """
+        Forgets a job whose result was consumed or is no longer wanted, so the queue
+        keeps nothing it holds, such as upload buffers or corpus leases, alive.
+        """
+        with self._lock:
+            self.jobs.pop(job.id, None)
+        job.result = None
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            try:
+                job.check_cancelled()
+                result = job.function(job, *job.args)
+                # Nobody applies the result of a job cancelled while it ran its last stage
+                job.check_cancelled()
+                job.result, status = result, "done"
+            except JobCancelled:
+                status = "cancelled"
+            except Exception as e:
+                # The traceback's frames would keep the job's arguments alive
+                status, job.error = "failed", e.with_traceback(None)
+
+            # The arguments may hold large buffers, which are not needed once the job ran
+            job.function = job.args = result = None
+
+            # finished_at must be set before a finished status is visible to submit() and the UI
+            job.finished_at = time.time()
+            if status == "done":
+                job.progress = 1.0
+            job.status = status
+            self._queue.task_done()
+            self.prune()
+
+# Shared by every session of this Streamlit process
+job_queue = JobQueue()
@@ -0,0 +1,110 @@
+import re
+import math
+import heapq
+import threading
+from weakref import WeakKeyDictionary
+from collections import Counter
+
+# Keeps identifiers such as part numbers (AB-1234), versions (v1.2) and function names (chunk_pdf) whole
+TOKEN_PATTERN = re.compile(r"\w[\w.\-]*\w|\w")
+
+def tokenize(text):
+    """
+    Splits text into lowercase keyword tokens.
+    """
+    return TOKEN_PATTERN.findall(text.lower())
+
+class KeywordIndex:
+    """
+    In-memory inverted index scored with BM25, used next to the vectorstore for exact-term matches.
+    """
+
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings = {}
+        self.documents = {}
+        self.doc_lengths = {}
+        self.total_length = 0
+        self._lock = threading.Lock()
+
+    def add(self, ids, texts, metadatas):
+        """
+        Indexes the chunks, replacing any chunk already stored under the same ID.
+        """
+        with self._lock:
+            for chunk_id, text, metadata in zip(ids, texts, metadatas):
+                self._remove(chunk_id)
+                term_counts = Counter(tokenize(text))
+                for term, count in term_counts.items():
+                    self.postings.setdefault(term, {})[chunk_id] = count
+                self.documents[chunk_id] = (text, metadata or {})
+                self.doc_lengths[chunk_id] = sum(term_counts.values())
+                self.total_length += self.doc_lengths[chunk_id]
+
+    def remove(self, ids):
+        """
+        Removes the chunks with the given IDs.
+        """
+        with self._lock:
+            for chunk_id in ids:
+                self._remove(chunk_id)
+
+    def _remove(self, chunk_id):
+        if chunk_id not in self.documents:
+            return
+        text, _ = self.documents.pop(chunk_id)
+        for term in set(tokenize(text)):
+            postings = self.postings.get(term)
+            if postings is not None:
+                postings.pop(chunk_id, None)
+                if not postings:
+                    del self.postings[term]
+        self.total_length -= self.doc_lengths.pop(chunk_id)
+
+    def search(self, query, k):
+        """
+        Returns up to k (chunk_id, text, metadata, score) tuples ranked by BM25 score.
+        """
+        with self._lock:
+            count = len(self.documents)
+            if count == 0:
+                return []
+            average_length = self.total_length / count
+
+            scores = {}
+            for term in set(tokenize(query)):
+                postings = self.postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for chunk_id, frequency in postings.items():
+                    norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[chunk_id] / average_length)
+                    scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * frequency * (self.k1 + 1) / (frequency + norm)
+
+            best = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+            return [(chunk_id, *self.documents[chunk_id], score) for chunk_id, score in best]
+
+# One keyword index per vectorstore object, dropped together with the vectorstore
+_keyword_indexes = WeakKeyDictionary()
+_keyword_indexes_lock = threading.Lock()
+
+def keyword_index_for(vectorstore):
+    """
+    Returns the keyword index of a vectorstore, building it from the stored chunks on first use.
+    """
+    with _keyword_indexes_lock:
+        index = _keyword_indexes.get(vectorstore)
+        if index is None:
+            index = KeywordIndex()
+            stored = vectorstore.get(include=["documents", "metadatas"])
+            index.add(stored["ids"], stored["documents"], stored["metadatas"])
+            _keyword_indexes[vectorstore] = index
+        return index
+
+def existing_keyword_index(vectorstore):
+    """
+    Returns the keyword index of a vectorstore if it has been built, otherwise None.
+    """
+    with _keyword_indexes_lock:
+        return _keyword_indexes.get(vectorstore)
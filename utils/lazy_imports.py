@@ -0,0 +1,120 @@
+"""
+Lazy imports of heavy optional dependencies, with an import-time report.
+
+    python -m utils.lazy_imports
+
+imports the app's modules and every registered dependency, each in a fresh interpreter,
+and prints how long each one takes to import cold.
+"""
+import sys
+import time
+import argparse
+import importlib
+import subprocess
+from collections.abc import Mapping
+from utils.tracing import record
+
+# Seconds each lazily imported module took on its first import in this process
+import_times = {}
+
+def import_module(name):
+    """
+    Imports a module on first use. The first import is timed, including the modules it pulls in,
+    and recorded as an "import" span.
+    """
+    # Always going through importlib takes the module's import lock, so a thread never gets
+    # a module another thread is still initializing, as a plain sys.modules lookup could
+    imported = name in sys.modules
+    start = time.perf_counter()
+    module = importlib.import_module(name)
+    seconds = time.perf_counter() - start
+    if not imported and name not in import_times:
+        import_times[name] = seconds
+        record("import", seconds, module=name)
+    return module
+
+def load_object(target):
+    """
+    Returns the object named by a "module:attribute" target, importing its module on first use.
+    """
+    module, _, attribute = target.partition(":")
+    return getattr(import_module(module), attribute)
+
+# Every LazyRegistry, so the report can cover all of their targets
+registries = []
+
+class LazyRegistry(Mapping):
+    """
+    Read-only mapping of names to "module:attribute" targets, resolved on first lookup.
+    Listing or testing the names never imports anything.
+    """
+
+    def __init__(self, targets):
+        self.targets = dict(targets)
+        self._loaded = {}
+        registries.append(self)
+
+    def __getitem__(self, name):
+        if name not in self._loaded:
+            self._loaded[name] = load_object(self.targets[name])
+        return self._loaded[name]
+
+    def __iter__(self):
+        return iter(self.targets)
+
+    def __len__(self):
+        return len(self.targets)
+
+def import_report():
+    """
+    Returns the modules imported lazily so far with their first import time, slowest first.
+    """
+    return [{"module": name, "seconds": seconds} for name, seconds in sorted(import_times.items(), key=lambda item: -item[1])]
+
+def cold_import_seconds(module, python=sys.executable):
+    """
+    Imports a module in a fresh interpreter and returns how long the import took.
+    """
+    code = f"import time; start = time.perf_counter(); import {module}; print(time.perf_counter() - start)"
+    result = subprocess.run([python, "-c", code], capture_output=True, text=True, check=True)
+    return float(result.stdout.strip().splitlines()[-1])
+
+# Heavy modules imported with import_module or load_object outside of a registry
+DEPENDENCIES = [
+    "pandas",
+    "docx",
+    "pptx",
+    "pypdf",
+    "utils.pdf_pages",
+    "langchain_text_splitters",
+    "langchain_community.document_loaders",
+    "langchain.chains",
+    "langchain_core.prompts",
+    "langchain_google_genai",
+    "utils.crawler",
+]
+
+def main():
+    parser = argparse.ArgumentParser(description="Report the cold import time of the app's modules and their optional dependencies.")
+    parser.add_argument("--repeat", type=int, default=3, help="Fresh interpreters per module; the fastest run is reported")
+    args = parser.parse_args()
+
+    # Importing the ingestion module fills the registries without importing their targets. Run with -m,
+    # this file is __main__, so the registries are those of the utils.lazy_imports module it imports
+    import utils.ingestion
+    from utils.lazy_imports import registries
+
+    entry_points = ["ragify", "utils.ingestion", "ui.sidebar", "ui.chat"]
+    dependencies = sorted({target.partition(":")[0] for registry in registries for target in registry.targets.values()})
+    dependencies = [module for module in dependencies if module not in entry_points]
+    dependencies += sorted(set(DEPENDENCIES) - set(dependencies))
+
+    print(f"{'module':<45} {'cold import (s)':>16}")
+    for group, modules in (("App modules", entry_points), ("Loaded on first use", dependencies)):
+        print(f"\n{group}")
+        for module in modules:
+            seconds = min(cold_import_seconds(module) for _ in range(args.repeat))
+            print(f"{module:<45} {seconds:>16.3f}")
+
+if __name__ == "__main__":
+    main()
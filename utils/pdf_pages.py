@@ -0,0 +1,213 @@
+import os
+import time
+import zlib
+import sqlite3
+import hashlib
+import threading
+import multiprocessing
+from contextlib import contextmanager, ExitStack
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
+from utils.catalog import file_fingerprint
+from utils.uploads import open_binary, buffer_fingerprint, acquire_spill, release_spill
+from utils.lazy_imports import load_object
+from utils.tracing import trace
+from utils.constants import (
+    PDF_PAGE_CACHE_PATH,
+    PDF_PAGE_CACHE_MAX_DOCUMENTS,
+    PDF_EXTRACT_WORKERS,
+    PDF_PAGES_PER_TASK,
+    PDF_PARALLEL_MIN_PAGES,
+)
+
+def pdf_fingerprint(file):
+    """
+    Returns the sha256 of a PDF given as a path, a bytes-like buffer or a binary file object.
+    """
+    if isinstance(file, (bytes, bytearray, memoryview)):
+        return buffer_fingerprint(file)
+    if not hasattr(file, "read"):
+        return file_fingerprint(file)
+    with open_binary(file) as stream:
+        return hashlib.file_digest(stream, "sha256").hexdigest()
+
+def count_pages(file):
+    """
+    Returns the number of pages of a PDF without extracting any text.
+    """
+    with open_binary(file) as stream:
+        return len(load_object("pypdf:PdfReader")(stream).pages)
+
+def extract_page_numbers(file, numbers):
+    """
+    Extracts the text of the given pages with a single reader and returns {page number: text}.
+    """
+    with open_binary(file) as stream:
+        reader = load_object("pypdf:PdfReader")(stream)
+        return {number: reader.pages[number].extract_text() for number in numbers}
+
+def extract_page_range(file, start, stop):
+    """
+    Extracts the text of pages start..stop-1. Runs in worker processes, so each call opens its own reader.
+    """
+    return extract_page_numbers(file, range(start, stop))
+
+def page_ranges(numbers, size):
+    """
+    Groups sorted page numbers into contiguous (start, stop) ranges of at most size pages.
+    """
+    ranges = []
+    for number in numbers:
+        if ranges and ranges[-1][1] == number and ranges[-1][1] - ranges[-1][0] < size:
+            ranges[-1][1] += 1
+        else:
+            ranges.append([number, number + 1])
+    return [tuple(page_range) for page_range in ranges]
+
+class PageTextCache:
+    """
+    Persistent cache of the text of every PDF page, keyed by the file's sha256 and page number.
+
+    Text is stored zlib-compressed, so re-chunking a PDF with other chunk settings or
+    ingesting the same file again never parses it. Whole documents are evicted least
+    recently used first once more than max_documents are cached.
+    """
+
+    def __init__(self, cache_path=PDF_PAGE_CACHE_PATH, max_documents=PDF_PAGE_CACHE_MAX_DOCUMENTS):
+        self.max_documents = max_documents
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(cache_path, timeout=30, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS documents (fingerprint TEXT PRIMARY KEY, pages INTEGER NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS pages (fingerprint TEXT NOT NULL, page INTEGER NOT NULL, text BLOB NOT NULL, PRIMARY KEY (fingerprint, page))"
+        )
+        self._conn.commit()
+
+    def lookup(self, fingerprint):
+        """
+        Returns (page count, set of cached page numbers) of a document,
+        or (None, set()) if the document was never seen.
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT pages FROM documents WHERE fingerprint = ?", (fingerprint,)).fetchone()
+            if row is None:
+                return None, set()
+            rows = self._conn.execute("SELECT page FROM pages WHERE fingerprint = ?", (fingerprint,)).fetchall()
+            self._conn.execute("UPDATE documents SET last_used = ? WHERE fingerprint = ?", (time.time(), fingerprint))
+            self._conn.commit()
+        return row[0], {page for page, in rows}
+
+    def read(self, fingerprint, start, stop):
+        """
+        Returns {page number: text} of the cached pages start..stop-1 of a document.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT page, text FROM pages WHERE fingerprint = ? AND page >= ? AND page < ?", (fingerprint, start, stop)
+            ).fetchall()
+        return {page: zlib.decompress(text).decode("utf-8") for page, text in rows}
+
+    def store(self, fingerprint, page_count, texts):
+        """
+        Caches extracted pages given as {page number: text} and evicts the least recently used documents.
+        """
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO documents VALUES (?, ?, ?)", (fingerprint, page_count, time.time()))
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO pages VALUES (?, ?, ?)",
+                [(fingerprint, page, zlib.compress(text.encode("utf-8"))) for page, text in texts.items()],
+            )
+            evicted = self._conn.execute(
+                "SELECT fingerprint FROM documents ORDER BY last_used DESC LIMIT -1 OFFSET ?", (self.max_documents,)
+            ).fetchall()
+            self._conn.executemany("DELETE FROM pages WHERE fingerprint = ?", evicted)
+            self._conn.executemany("DELETE FROM documents WHERE fingerprint = ?", evicted)
+            self._conn.commit()
+
+@lru_cache(maxsize=None)
+def _open_page_cache(pid):
+    return PageTextCache()
+
+def page_cache():
+    """
+    Returns the page text cache of this process. Forked worker processes open their own
+    connection, since an SQLite connection must not be shared across a fork.
+    """
+    return _open_page_cache(os.getpid())
+
+@contextmanager
+def pdf_path(file, fingerprint):
+    """
+    Yields a path worker processes can read the PDF from, spilling buffers and file objects
+    to a shared file rather than pickling a copy of them for every task.
+    """
+    if isinstance(file, (str, os.PathLike)):
+        yield file
+        return
+    if isinstance(file, (bytes, bytearray, memoryview)):
+        path = acquire_spill(file, fingerprint, ".pdf")
+    else:
+        with open_binary(file) as stream:
+            path = acquire_spill(stream.read(), fingerprint, ".pdf")
+    try:
+        yield path
+    finally:
+        release_spill(path)
+
+def iter_pages(file, cache=None, max_workers=PDF_EXTRACT_WORKERS, pages_per_task=PDF_PAGES_PER_TASK, parallel_min_pages=PDF_PARALLEL_MIN_PAGES):
+    """
+    Lazily yields the text of every page of a PDF given as a path, a bytes-like buffer or a
+    binary file object, in page order.
+
+    Pages already in the cache are read from it range by range and not parsed again. When
+    at least parallel_min_pages are missing, they are split into ranges of pages_per_task
+    pages and extracted across a pool of up to max_workers processes, one per CPU, unless
+    this already is a worker process of the ingestion pool; otherwise they are extracted
+    here with a single reader. Each range is yielded and cached as soon as it is ready.
+    """
+    cache = cache if cache is not None else page_cache()
+    with trace("pdf_extract") as attributes, ExitStack() as stack:
+        fingerprint = pdf_fingerprint(file)
+        page_count, cached = cache.lookup(fingerprint)
+        if page_count is None:
+            page_count = count_pages(file)
+            cache.store(fingerprint, page_count, {})
+        missing = [number for number in range(page_count) if number not in cached]
+        attributes["pages"] = page_count
+        attributes["cached_pages"] = page_count - len(missing)
+
+        ranges = page_ranges(missing, pages_per_task)
+        in_worker = multiprocessing.parent_process() is not None
+        workers = min(max_workers, len(ranges), os.cpu_count() or 1) if len(missing) >= parallel_min_pages and not in_worker else 0
+        attributes["workers"] = workers
+
+        # Every worker task opens its own reader, which only pays off with more than one CPU
+        if workers > 1:
+            path = stack.enter_context(pdf_path(file, fingerprint))
+            pool = stack.enter_context(ProcessPoolExecutor(max_workers=workers))
+            futures = {start: pool.submit(extract_page_range, path, start, stop) for start, stop in ranges}
+            extract = lambda start, stop: futures.pop(start).result()
+        elif ranges:
+            reader = load_object("pypdf:PdfReader")(stack.enter_context(open_binary(file)))
+            extract = lambda start, stop: {number: reader.pages[number].extract_text() for number in range(start, stop)}
+
+        segments = sorted(
+            [(start, stop, False) for start, stop in page_ranges(sorted(cached), pages_per_task)]
+            + [(start, stop, True) for start, stop in ranges]
+        )
+        for start, stop, is_missing in segments:
+            if is_missing:
+                texts = extract(start, stop)
+                cache.store(fingerprint, page_count, texts)
+            else:
+                texts = cache.read(fingerprint, start, stop)
+                # Another session may have evicted the document since the lookup
+                evicted = [number for number in range(start, stop) if number not in texts]
+                if evicted:
+                    extracted = extract_page_numbers(file, evicted)
+                    cache.store(fingerprint, page_count, extracted)
+                    texts.update(extracted)
+            for number in range(start, stop):
+                yield texts[number]
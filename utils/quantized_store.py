@@ -0,0 +1,275 @@
+import os
+import json
+import sqlite3
+import threading
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+from utils.constants import QUANTIZED_SEARCH_BLOCK_ROWS, QUANTIZED_RERANK_FACTOR
+
+def quantize(vectors):
+    """
+    Normalizes float vectors and quantizes them to int8 with one scale per vector.
+    Returns (normalized vectors, int8 codes, scales).
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    vectors = vectors / np.where(norms == 0, 1, norms)
+    scales = np.abs(vectors).max(axis=1) / 127
+    scales = np.where(scales == 0, 1, scales).astype(np.float32)
+    codes = np.round(vectors / scales[:, None]).astype(np.int8)
+    return vectors, codes, scales
+
+class QuantizedVectorStore(VectorStore):
+    """
+    Local vectorstore that searches int8-quantized embeddings in memory-mapped files.
+
+    Every collection is three append-only files (int8 codes, per-vector scales and the
+    normalized float32 vectors) and a SQLite table with the chunk text and metadata.
+    Opening a collection only maps the files, so it is nearly instant whatever its size.
+    A search scans the int8 codes block by block, then re-ranks the best candidates by
+    their exact cosine similarity, so only those rows of the float32 file are read.
+    Deleted chunks are masked out and their rows reclaimed by compact().
+
+    The constructor takes the same arguments as Chroma, and get() answers the subset of
+    Chroma's get() used by the index manager, so the two backends are interchangeable.
+    """
+
+    def __init__(self, collection_name="langchain", persist_directory=None, embedding_function=None):
+        self.embedding_function = embedding_function
+        self.persist_directory = persist_directory or "."
+        os.makedirs(self.persist_directory, exist_ok=True)
+        self._prefix = os.path.join(self.persist_directory, collection_name)
+        self._lock = threading.RLock()
+
+        self._conn = sqlite3.connect(f"{self._prefix}.sqlite3", check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS chunks ("
+            "id TEXT PRIMARY KEY, position INTEGER NOT NULL, source TEXT, document TEXT NOT NULL, metadata TEXT NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS chunks_source ON chunks (source)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._conn.commit()
+
+        dimension = self._conn.execute("SELECT value FROM meta WHERE key = 'dimension'").fetchone()
+        self.dimension = int(dimension[0]) if dimension else None
+        self._load()
+
+    @property
+    def embeddings(self):
+        return self.embedding_function
+
+    def _path(self, suffix):
+        return f"{self._prefix}.{suffix}"
+
+    def _map(self, suffix, dtype, columns):
+        path = self._path(suffix)
+        rows = os.path.getsize(path) // (np.dtype(dtype).itemsize * columns) if os.path.exists(path) else 0
+        if rows == 0:
+            return np.zeros((0, columns) if columns > 1 else 0, dtype=dtype)
+        return np.memmap(path, dtype=dtype, mode="r", shape=(rows, columns) if columns > 1 else (rows,))
+
+    def _map_files(self):
+        if self.dimension is None:
+            self._codes = np.zeros((0, 0), dtype=np.int8)
+            self._scales = np.zeros(0, dtype=np.float32)
+            self._vectors = np.zeros((0, 0), dtype=np.float32)
+        else:
+            self._codes = self._map("codes", np.int8, self.dimension)
+            self._scales = self._map("scales", np.float32, 1)
+            self._vectors = self._map("vectors", np.float32, self.dimension)
+
+    def _load(self):
+        """
+        Maps the vector files and rebuilds the id <-> position lookups from SQLite.
+        """
+        self._map_files()
+        rows = len(self._scales)
+        self._alive = np.zeros(rows, dtype=bool)
+        self._ids = [None] * rows
+        self._positions = {}
+        for chunk_id, position in self._conn.execute("SELECT id, position FROM chunks"):
+            if position < rows:
+                self._alive[position] = True
+                self._ids[position] = chunk_id
+                self._positions[chunk_id] = position
+
+    def add_embeddings(self, ids, embeddings, metadatas=None, documents=None):
+        """
+        Adds chunks whose embeddings are already known, replacing chunks stored under the same IDs.
+        """
+        if not ids:
+            return []
+        metadatas = metadatas or [{} for _ in ids]
+        documents = documents or ["" for _ in ids]
+        vectors, codes, scales = quantize(embeddings)
+
+        with self._lock:
+            if self.dimension is None:
+                self.dimension = vectors.shape[1]
+                self._conn.execute("INSERT INTO meta VALUES ('dimension', ?)", (str(self.dimension),))
+            self._delete_rows(ids)
+
+            start = len(self._scales)
+            for suffix, array in (("codes", codes), ("scales", scales), ("vectors", vectors)):
+                with open(self._path(suffix), "ab") as f:
+                    f.write(array.tobytes())
+
+            self._conn.executemany(
+                "INSERT INTO chunks VALUES (?, ?, ?, ?, ?)",
+                [
+                    (chunk_id, start + i, (metadata or {}).get("source"), document, json.dumps(metadata or {}))
+                    for i, (chunk_id, document, metadata) in enumerate(zip(ids, documents, metadatas))
+                ],
+            )
+            self._conn.commit()
+
+            self._map_files()
+            self._alive = np.concatenate([self._alive, np.ones(len(ids), dtype=bool)])
+            self._ids.extend(ids)
+            self._positions.update((chunk_id, start + i) for i, chunk_id in enumerate(ids))
+        return list(ids)
+
+    def add_texts(self, texts, metadatas=None, *, ids=None, **kwargs):
+        texts = list(texts)
+        ids = list(ids) if ids is not None else [os.urandom(16).hex() for _ in texts]
+        return self.add_embeddings(ids, self.embedding_function.embed_documents(texts), metadatas, texts)
+
+    def _delete_rows(self, ids):
+        placeholders = ",".join("?" * len(ids))
+        self._conn.execute(f"DELETE FROM chunks WHERE id IN ({placeholders})", list(ids))
+        for chunk_id in ids:
+            position = self._positions.pop(chunk_id, None)
+            if position is not None:
+                self._alive[position] = False
+
+    def delete(self, ids=None, **kwargs):
+        """
+        Deletes chunks by ID and compacts the files once most rows are dead.
+        """
+        if not ids:
+            return None
+        with self._lock:
+            self._delete_rows(ids)
+            self._conn.commit()
+            if len(self._alive) and self._alive.mean() < 0.5:
+                self.compact()
+        return True
+
+    def compact(self):
+        """
+        Rewrites the vector files without the rows of deleted chunks.
+        """
+        with self._lock:
+            keep = np.flatnonzero(self._alive)
+            if self.dimension is None or len(keep) == len(self._alive):
+                return
+            arrays = {"codes": np.array(self._codes[keep]), "scales": np.array(self._scales[keep]), "vectors": np.array(self._vectors[keep])}
+            self._codes = self._scales = self._vectors = None
+
+            for suffix, array in arrays.items():
+                with open(self._path(f"{suffix}.tmp"), "wb") as f:
+                    f.write(array.tobytes())
+                os.replace(self._path(f"{suffix}.tmp"), self._path(suffix))
+
+            self._conn.executemany(
+                "UPDATE chunks SET position = ? WHERE id = ?",
+                [(new, self._ids[old]) for new, old in enumerate(keep)],
+            )
+            self._conn.commit()
+            self._load()
+
+    def get(self, ids=None, where=None, limit=None, offset=None, include=("documents", "metadatas")):
+        """
+        Returns stored chunks like Chroma's get(): a dict of ids and the included
+        "documents", "metadatas" and "embeddings". where supports {key: value} equality;
+        limit and offset page through the matching chunks in storage order.
+        """
+        query = "SELECT id, position, document, metadata FROM chunks"
+        clauses, parameters = [], []
+        if ids is not None:
+            if not ids:
+                return {"ids": [], **{key: [] for key in include}}
+            clauses.append(f"id IN ({','.join('?' * len(ids))})")
+            parameters.extend(ids)
+        for key, value in (where or {}).items():
+            clauses.append("source = ?" if key == "source" else "json_extract(metadata, ?) = ?")
+            parameters.extend([value] if key == "source" else [f"$.{key}", value])
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+
+        with self._lock:
+            rows = self._conn.execute(
+                query + " ORDER BY position LIMIT ? OFFSET ?", parameters + [-1 if limit is None else limit, offset or 0]
+            ).fetchall()
+            vectors = self._vectors
+
+        result = {"ids": [row[0] for row in rows]}
+        if "documents" in include:
+            result["documents"] = [row[2] for row in rows]
+        if "metadatas" in include:
+            result["metadatas"] = [json.loads(row[3]) for row in rows]
+        if "embeddings" in include:
+            result["embeddings"] = np.array(vectors[[row[1] for row in rows]]) if rows else np.zeros((0, self.dimension or 0))
+        return result
+
+    def _documents(self, positions):
+        with self._lock:
+            ids = [self._ids[position] for position in positions]
+        stored = self.get(ids=ids)
+        by_id = {
+            chunk_id: Document(id=chunk_id, page_content=document, metadata=metadata)
+            for chunk_id, document, metadata in zip(stored["ids"], stored["documents"], stored["metadatas"])
+        }
+        return [by_id[chunk_id] for chunk_id in ids]
+
+    def search_positions(self, vector, k, rerank_factor=QUANTIZED_RERANK_FACTOR, block_rows=QUANTIZED_SEARCH_BLOCK_ROWS):
+        """
+        Returns the positions and exact cosine similarities of the k nearest stored vectors.
+        """
+        with self._lock:
+            codes, scales, vectors, alive = self._codes, self._scales, self._vectors, self._alive
+        if not alive.any():
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+        query = np.asarray(vector, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1)
+
+        # Approximate scores from the int8 codes, a block at a time to bound the float copy
+        approximate = np.empty(len(scales), dtype=np.float32)
+        for start in range(0, len(scales), block_rows):
+            end = start + block_rows
+            approximate[start:end] = (codes[start:end].astype(np.float32) @ query) * scales[start:end]
+        approximate[~alive] = -np.inf
+
+        candidates = min(int(alive.sum()), k * rerank_factor)
+        candidates = np.argpartition(-approximate, candidates - 1)[:candidates]
+        candidates = candidates[np.isfinite(approximate[candidates])]
+        candidates.sort()
+
+        # Exact re-ranking reads only the candidate rows of the float32 file
+        exact = vectors[candidates] @ query
+        best = np.argsort(-exact)[:k]
+        return candidates[best], exact[best]
+
+    def similarity_search_by_vector_with_score(self, embedding, k=4):
+        positions, scores = self.search_positions(embedding, k)
+        return list(zip(self._documents(positions), scores.tolist()))
+
+    def similarity_search_by_vector(self, embedding, k=4, **kwargs):
+        return [document for document, _ in self.similarity_search_by_vector_with_score(embedding, k)]
+
+    def similarity_search_with_score(self, query, k=4, **kwargs):
+        return self.similarity_search_by_vector_with_score(self.embedding_function.embed_query(query), k)
+
+    def similarity_search(self, query, k=4, **kwargs):
+        return [document for document, _ in self.similarity_search_with_score(query, k)]
+
+    def _select_relevance_score_fn(self):
+        return lambda score: score
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, *, ids=None, collection_name="langchain", persist_directory=None, **kwargs):
+        vectorstore = cls(collection_name=collection_name, persist_directory=persist_directory, embedding_function=embedding)
+        vectorstore.add_texts(texts, metadatas, ids=ids)
+        return vectorstore
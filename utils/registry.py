@@ -0,0 +1,231 @@
+import time
+import uuid
+import shutil
+import weakref
+import threading
+from ragify import create_vectorstore, update_vectorstore, create_rag_chain, close_vectorstore
+from utils.index_manager import vectorstore_fingerprint, copy_vectorstore
+from utils.catalog import corpus_catalog
+from utils.constants import SHARED_CORPUS_IDLE_TTL, MAX_IDLE_SHARED_CORPORA, VECTORSTORE_BACKEND
+
+class Lease:
+    """
+    A session's reference to a shared resource.
+
+    The reference is returned to the registry on release() or, if the session
+    goes away without releasing it, when the lease is garbage collected.
+    """
+
+    def __init__(self, registry, key, resource):
+        self.key = key
+        self.resource = resource
+        self._finalizer = weakref.finalize(self, registry.release, key)
+
+    def release(self):
+        self._finalizer()
+
+class ResourceRegistry:
+    """
+    Process-wide pool of resources shared between Streamlit sessions.
+
+    Entries are reference counted through leases. Entries nobody holds are kept
+    for idle_ttl seconds so a returning corpus is reused, and at most max_idle of
+    them are kept at all, which bounds memory as sessions come and go.
+    on_evict(resource) is called for every evicted entry, to free what it holds beyond
+    its Python references.
+    """
+
+    def __init__(self, idle_ttl=SHARED_CORPUS_IDLE_TTL, max_idle=MAX_IDLE_SHARED_CORPORA, on_evict=None):
+        self.idle_ttl = idle_ttl
+        self.max_idle = max_idle
+        self.on_evict = on_evict
+        self._entries = {}
+        self._building = {}
+        self._lock = threading.RLock()
+
+    def acquire(self, key, factory):
+        """
+        Returns a lease on the resource for key, calling factory() only if it is not in the pool.
+        Only one factory runs per key at a time; other callers wait for it and share its result,
+        or build it themselves if it failed.
+        """
+        while True:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    entry["refs"] += 1
+                    return Lease(self, key, entry["resource"])
+                building = self._building.get(key)
+                if building is None:
+                    building = self._building[key] = threading.Event()
+                    break
+            building.wait()
+
+        # Build outside the lock so other sessions are not blocked while embedding
+        try:
+            resource = factory()
+            with self._lock:
+                self._entries[key] = {"resource": resource, "refs": 1, "idle_since": None}
+                self.evict_idle()
+                return Lease(self, key, resource)
+        finally:
+            with self._lock:
+                del self._building[key]
+            building.set()
+
+    def release(self, key):
+        """
+        Drops one reference to key and evicts idle entries.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            entry["refs"] -= 1
+            if entry["refs"] <= 0:
+                entry["idle_since"] = time.monotonic()
+            self.evict_idle()
+
+    def evict_idle(self):
+        """
+        Removes unreferenced entries that expired, then the oldest ones above max_idle.
+        """
+        with self._lock:
+            now = time.monotonic()
+            idle = sorted(
+                (entry["idle_since"], key) for key, entry in self._entries.items() if entry["refs"] <= 0
+            )
+            for position, (idle_since, key) in enumerate(idle):
+                if now - idle_since > self.idle_ttl or position < len(idle) - self.max_idle:
+                    entry = self._entries.pop(key)
+                    if self.on_evict is not None:
+                        self.on_evict(entry["resource"])
+
+    def keys(self):
+        """
+        Returns the keys of every pooled entry, in use, idle or still being built.
+        """
+        with self._lock:
+            return set(self._entries) | set(self._building)
+
+    def stats(self):
+        """
+        Returns the number of pooled entries and how many of them are in use.
+        """
+        with self._lock:
+            in_use = sum(1 for entry in self._entries.values() if entry["refs"] > 0)
+            return {"entries": len(self._entries), "in_use": in_use}
+
+# Shared by every session of this Streamlit process
+corpus_registry = ResourceRegistry(on_evict=lambda resource: close_vectorstore(resource[0]))
+
+def corpus_collection_name(fingerprint):
+    """
+    Returns the Chroma collection name used for a corpus.
+    """
+    return f"corpus_{fingerprint[:16]}"
+
+# Tokens naming the directories of corpora being built, whose fingerprint is not known yet
+pending_builds = set()
+
+def collect_garbage():
+    """
+    Removes stale vectorstore directories, keeping every corpus this process still pools or builds.
+    """
+    return corpus_catalog().collect_garbage(in_use=corpus_registry.keys() | pending_builds)
+
+def open_persisted_corpus(record):
+    """
+    Opens a corpus persisted on disk without embedding anything.
+    """
+    vectorstore = create_vectorstore([], record["directory"], record["collection_name"], backend=record["backend"])
+    return vectorstore, create_rag_chain(vectorstore)
+
+def reopen_corpus(sources):
+    """
+    Returns a lease on the persisted corpus built from exactly these {source: fingerprint} pairs, or None.
+    """
+    record = corpus_catalog().find(sources)
+    if record is None:
+        return None
+
+    lease = corpus_registry.acquire(record["fingerprint"], lambda: open_persisted_corpus(record))
+    corpus_catalog().touch(record["fingerprint"])
+    return lease
+
+def build_corpus(chunks, sources, base=None, removed_sources=(), on_batch=None):
+    """
+    Embeds a stream of chunks into a new corpus and returns a lease on it.
+
+    Chunks are upserted batch by batch as they arrive, so only one embedding batch of them
+    is held here, and the corpus fingerprint is computed from the stored chunk IDs once the
+    stream ends. With a base lease, the new corpus starts as a copy of the base corpus
+    without removed_sources. If an identical corpus is pooled or persisted already, the new
+    build is discarded in its favor, and only one of two identical concurrent builds is
+    ever registered. sources maps every source of the corpus to its fingerprint and is only
+    read once chunks are exhausted, so it may be filled in while they are produced.
+    on_batch reports embedding progress and may raise to abort the build.
+    """
+    token = uuid.uuid4().hex
+    directory = corpus_catalog().new_directory(token)
+    collection_name = corpus_collection_name(token)
+    vectorstore = None
+    pending_builds.add(token)
+    try:
+        vectorstore = create_vectorstore([], directory, collection_name)
+        if base is not None:
+            copy_vectorstore(base.resource[0], vectorstore)
+        update_vectorstore(vectorstore, chunks, removed_sources, on_batch=on_batch)
+        fingerprint = vectorstore_fingerprint(vectorstore)
+
+        def adopt():
+            record = corpus_catalog().get(fingerprint)
+            if record is not None:
+                return open_persisted_corpus(record)
+            corpus_catalog().register(fingerprint, directory, collection_name, sources, VECTORSTORE_BACKEND)
+            return vectorstore, create_rag_chain(vectorstore)
+
+        lease = base if base is not None and fingerprint == base.key else corpus_registry.acquire(fingerprint, adopt)
+        corpus_catalog().touch(fingerprint)
+    except BaseException:
+        discard_build(vectorstore, directory)
+        raise
+    finally:
+        pending_builds.discard(token)
+
+    if lease.resource[0] is not vectorstore:
+        discard_build(vectorstore, directory)
+    collect_garbage()
+    return lease
+
+def discard_build(vectorstore, directory):
+    """
+    Deletes a corpus built by build_corpus that was not registered.
+    """
+    if vectorstore is not None:
+        close_vectorstore(vectorstore)
+    shutil.rmtree(directory, ignore_errors=True)
+
+def open_corpus(chunks, sources, on_batch=None):
+    """
+    Returns a lease on the (vectorstore, rag_chain) for a stream of chunks, reusing an
+    identical corpus that a session built or that was persisted earlier. sources is
+    recorded in the catalog as in build_corpus.
+    """
+    return build_corpus(chunks, sources, on_batch=on_batch)
+
+def update_corpus(lease, chunks, removed_sources, sources, on_batch=None):
+    """
+    Applies a stream of new chunks and removed sources to a session's corpus and returns
+    the lease for the result.
+
+    The changes are applied to a copy of the corpus, made from its stored embeddings
+    without embedding anything again, so the corpus the session and any other session
+    answer from never changes under them. The session swaps in the returned lease and its
+    chain in one step once the copy is complete; if the build fails or is aborted, the
+    given lease stays valid.
+    """
+    new_lease = build_corpus(chunks, sources, lease, removed_sources, on_batch)
+    if new_lease is not lease:
+        lease.release()
+    return new_lease
@@ -0,0 +1,111 @@
+import time
+import math
+from functools import lru_cache
+from langchain_core.documents import Document
+from utils.keyword_index import tokenize
+from utils.context import STOPWORDS
+from utils.tracing import trace
+from utils.constants import RERANK_BATCH_SIZE, RERANK_LATENCY_BUDGET, CROSS_ENCODER_MODEL
+
+class LexicalOverlapScorer:
+    """
+    Scores passages by how much of the question they cover: the share of question terms
+    they contain, a bonus for question bigrams found in order and a small term density term.
+    Needs no model, so it is the default reranker.
+    """
+
+    def score(self, query, texts):
+        terms = [term for term in tokenize(query) if term not in STOPWORDS]
+        if not terms:
+            return [0.0] * len(texts)
+        unique_terms = set(terms)
+        bigrams = set(zip(terms, terms[1:]))
+
+        scores = []
+        for text in texts:
+            tokens = tokenize(text)
+            token_set = set(tokens)
+            coverage = len(unique_terms & token_set) / len(unique_terms)
+            phrase = len(bigrams & set(zip(tokens, tokens[1:]))) / len(bigrams) if bigrams else 0.0
+            density = sum(1 for token in tokens if token in unique_terms) / math.sqrt(len(tokens) or 1)
+            scores.append(coverage + 0.5 * phrase + 0.1 * density)
+        return scores
+
+class CrossEncoderScorer:
+    """
+    Scores (question, passage) pairs with a small local cross-encoder on the CPU.
+    Needs the optional sentence-transformers package.
+    """
+
+    def __init__(self, model_name=CROSS_ENCODER_MODEL):
+        try:
+            from sentence_transformers import CrossEncoder
+        except ImportError as e:
+            raise ImportError("The cross-encoder reranker needs the sentence-transformers package") from e
+        self.model = CrossEncoder(model_name, device="cpu")
+
+    def score(self, query, texts):
+        return [float(score) for score in self.model.predict([(query, text) for text in texts], batch_size=len(texts))]
+
+RERANKERS = {
+    "lexical": LexicalOverlapScorer,
+    "cross-encoder": CrossEncoderScorer,
+}
+
+@lru_cache
+def get_reranker(name):
+    """
+    Returns the scorer registered under name, loaded once per process.
+    """
+    return RERANKERS[name]()
+
+def rerank(query, documents, scorer, top_k, batch_size=RERANK_BATCH_SIZE, latency_budget=RERANK_LATENCY_BUDGET):
+    """
+    Scores the candidate documents against the query in batches and returns the top_k.
+
+    Batches are scored in retrieval order until latency_budget seconds have passed;
+    candidates left unscored when the budget runs out keep their retrieval order behind
+    the scored ones. Returned documents carry rerank_score (None if unscored) and
+    rerank_seconds in their metadata.
+    """
+    start = time.perf_counter()
+    scores = []
+    with trace("rerank", candidates=len(documents)) as attributes:
+        for batch_start in range(0, len(documents), batch_size):
+            if scores and time.perf_counter() - start > latency_budget:
+                break
+            batch = documents[batch_start:batch_start + batch_size]
+            scores.extend(scorer.score(query, [document.page_content for document in batch]))
+
+        order = sorted(range(len(scores)), key=lambda index: -scores[index]) + list(range(len(scores), len(documents)))
+        seconds = time.perf_counter() - start
+        attributes["scored"] = len(scores)
+        attributes["budget_exceeded"] = len(scores) < len(documents)
+
+    return [
+        Document(
+            id=documents[index].id,
+            page_content=documents[index].page_content,
+            metadata={
+                **documents[index].metadata,
+                "rerank_score": scores[index] if index < len(scores) else None,
+                "rerank_seconds": seconds,
+            },
+        )
+        for index in order[:top_k]
+    ]
+
+def rerank_report(response):
+    """
+    Returns the rerank time and the score of each chunk in a RAG response's context.
+    """
+    documents = [document for document in response.get("context", []) if "rerank_score" in document.metadata]
+    if not documents:
+        return None
+    return {
+        "seconds": documents[0].metadata["rerank_seconds"],
+        "scores": [
+            {"chunk_id": document.metadata.get("chunk_id", document.id), "score": document.metadata["rerank_score"]}
+            for document in documents
+        ],
+    }
@@ -0,0 +1,75 @@
+from typing import Any, Optional
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from utils.keyword_index import keyword_index_for
+from utils.context import compress_context
+from utils.rerankers import rerank
+from utils.constants import SIMILAR_DOCUMENTS, HYBRID_FETCH_K, RRF_K, RERANK_DEPTH
+
+def reciprocal_rank_fusion(rankings, k, rrf_k=RRF_K):
+    """
+    Fuses several ranked lists of documents into the top k using reciprocal rank fusion.
+    Documents are matched across rankings by their chunk ID.
+    """
+    scores = {}
+    documents = {}
+    for ranking in rankings:
+        for rank, document in enumerate(ranking):
+            key = document.id or document.metadata.get("chunk_id") or document.page_content
+            scores[key] = scores.get(key, 0.0) + 1.0 / (rrf_k + rank + 1)
+            documents.setdefault(key, document)
+
+    best = sorted(scores, key=scores.get, reverse=True)[:k]
+    return [documents[key] for key in best]
+
+def embed_queries(embeddings, queries):
+    """
+    Embeds many queries in one call. Models without embed_queries are assumed to embed
+    queries and documents alike, as the offline stand-ins do.
+    """
+    embed = getattr(embeddings, "embed_queries", None)
+    return embed(queries) if embed is not None else embeddings.embed_documents(queries)
+
+class HybridRetriever(BaseRetriever):
+    """
+    Retrieves chunks by both dense similarity and BM25 keyword match and fuses the two rankings.
+    With a reranker, the top rerank_depth fused chunks are rescored and only the best k kept.
+    With a token_budget, the kept chunks are compressed to the sentences relevant to the query.
+    """
+
+    vectorstore: Any
+    k: int = SIMILAR_DOCUMENTS
+    fetch_k: int = HYBRID_FETCH_K
+    reranker: Optional[Any] = None
+    rerank_depth: int = RERANK_DEPTH
+    token_budget: Optional[int] = None
+
+    def _get_relevant_documents(self, query, *, run_manager=None):
+        dense = self.vectorstore.similarity_search(query, k=self.fetch_k)
+        return self._fuse(query, dense)
+
+    def retrieve_batch(self, queries):
+        """
+        Retrieves the documents for many queries, embedding all of them at once instead
+        of one model call per query. Returns one list of documents per query.
+        """
+        vectors = embed_queries(self.vectorstore.embeddings, queries)
+        return [
+            self._fuse(query, self.vectorstore.similarity_search_by_vector(vector, k=self.fetch_k))
+            for query, vector in zip(queries, vectors)
+        ]
+
+    def _fuse(self, query, dense):
+        sparse = [
+            Document(id=chunk_id, page_content=text, metadata=metadata)
+            for chunk_id, text, metadata, _ in keyword_index_for(self.vectorstore).search(query, self.fetch_k)
+        ]
+        if self.reranker is None:
+            documents = reciprocal_rank_fusion([dense, sparse], self.k)
+        else:
+            candidates = reciprocal_rank_fusion([dense, sparse], max(self.k, self.rerank_depth))
+            documents = rerank(query, candidates, self.reranker, self.k)
+        if self.token_budget is None:
+            return documents
+        # Reranked chunks are already in their best order
+        return compress_context(query, documents, self.token_budget, rescore=self.reranker is None)
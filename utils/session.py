@@ -1,14 +1,25 @@
 import streamlit as st
-from datetime import datetime
+from utils.chat_history import ChatHistory
+from utils.jobs import job_queue
+from utils.constants import CHAT_HISTORY_WINDOW_TURNS
 
 def session_initialization():
     # Initialize session state for chat history and RAG chain
     if "messages" not in st.session_state:
-        st.session_state.messages = []
+        st.session_state.messages = ChatHistory()
+
+    if "chat_turns_shown" not in st.session_state:
+        st.session_state.chat_turns_shown = CHAT_HISTORY_WINDOW_TURNS
 
     if "rag_chain" not in st.session_state:
         st.session_state.rag_chain = None
 
+    if "vectorstore" not in st.session_state:
+        st.session_state.vectorstore = None
+
+    if "corpus" not in st.session_state:
+        st.session_state.corpus = None
+
     if "processed_files" not in st.session_state:
         st.session_state.processed_files = []
 
@@ -18,8 +29,11 @@ def session_initialization():
     if "processed_website_urls" not in st.session_state:
         st.session_state.processed_website_urls = []
 
-    if "persist_directory" not in st.session_state:
-        st.session_state.persist_directory = f"./{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}_vectorstore"
+    if "source_fingerprints" not in st.session_state:
+        st.session_state.source_fingerprints = {}
+
+    if "ingestion_job" not in st.session_state:
+        st.session_state.ingestion_job = None
 
     if "no_of_yt_urls" not in st.session_state:
         st.session_state.no_of_yt_urls = 0
@@ -27,6 +41,9 @@ def session_initialization():
     if "no_of_website_urls" not in st.session_state:
         st.session_state.no_of_website_urls = 0
 
+    if "crawl_websites" not in st.session_state:
+        st.session_state.crawl_websites = False
+
     if "file_extensions" not in st.session_state:
         st.session_state.file_extensions = []
 
@@ -43,12 +60,25 @@ def session_initialization():
         st.session_state.toast_message = ""
 
 def reset_session():
-    st.session_state.messages = []
+    # Stop processing whose result would no longer be wanted
+    if st.session_state.ingestion_job is not None:
+        st.session_state.ingestion_job.cancel()
+        job_queue.discard(st.session_state.ingestion_job)
+
+    # Give the shared corpus back to the registry so it can be evicted once idle
+    if st.session_state.corpus is not None:
+        st.session_state.corpus.release()
+
+    st.session_state.corpus = None
+    st.session_state.messages.clear()
+    st.session_state.chat_turns_shown = CHAT_HISTORY_WINDOW_TURNS
     st.session_state.rag_chain = None
+    st.session_state.vectorstore = None
     st.session_state.processed_files = []
     st.session_state.processed_yt_urls = []
     st.session_state.processed_website_urls = []
-    st.session_state.persist_directory = f"./{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}_vectorstore"
+    st.session_state.source_fingerprints = {}
+    st.session_state.ingestion_job = None
     st.session_state.show_balloons = False
     st.session_state.content_changed = False
     st.session_state.toast_message = ""
\ No newline at end of file
@@ -0,0 +1,176 @@
+import json
+import time
+import threading
+import functools
+from collections import deque
+from contextlib import contextmanager
+from langchain_core.callbacks import BaseCallbackHandler
+from utils.constants import TRACE_BUFFER_SIZE
+
+# Most recent spans of this process; older spans are dropped automatically
+spans = deque(maxlen=TRACE_BUFFER_SIZE)
+_collectors = threading.local()
+
+def record_span(span):
+    """
+    Stores a finished span in the ring buffer and in the collector of the current thread, if any.
+    """
+    spans.append(span)
+    collected = getattr(_collectors, "spans", None)
+    if collected is not None:
+        collected.append(span)
+
+def record(stage, duration, **attributes):
+    """
+    Records a finished stage with its wall time in seconds and numeric or text attributes.
+    """
+    record_span({"stage": stage, "timestamp": time.time(), "duration": duration, **attributes})
+
+@contextmanager
+def trace(stage, **attributes):
+    """
+    Times the enclosed block as a stage. The yielded dict can be filled with attributes such as chunk counts.
+    """
+    start = time.perf_counter()
+    try:
+        yield attributes
+    finally:
+        record(stage, time.perf_counter() - start, **attributes)
+
+def traced_chunker(function):
+    """
+    Decorates a chunk_* function so every call records its wall time, chunk and character counts.
+    """
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        with trace(function.__name__) as attributes:
+            chunks = function(*args, **kwargs)
+            attributes["chunks"] = len(chunks)
+            attributes["characters"] = sum(len(chunk.page_content) for chunk in chunks)
+        return chunks
+    return wrapper
+
+@contextmanager
+def collect_spans():
+    """
+    Collects the spans recorded by the current thread inside the block, e.g. to send them
+    back from a worker process whose own ring buffer is not visible to the app.
+    """
+    _collectors.spans = collected = []
+    try:
+        yield collected
+    finally:
+        _collectors.spans = None
+
+class TracingCallbackHandler(BaseCallbackHandler):
+    """
+    LangChain callback handler that records retrieval, prompt stuffing and generation stages of a RAG chain.
+    """
+
+    # create_stuff_documents_chain names its document formatting step "format_inputs"
+    CHAIN_STAGES = {"format_inputs": "prompt_stuffing"}
+
+    def __init__(self):
+        self._starts = {}
+
+    def on_retriever_start(self, serialized, query, *, run_id, **kwargs):
+        self._starts[run_id] = time.perf_counter()
+
+    def on_retriever_end(self, documents, *, run_id, **kwargs):
+        start = self._starts.pop(run_id, None)
+        if start is not None:
+            record("retrieval", time.perf_counter() - start, documents=len(documents))
+
+    def on_chain_start(self, serialized, inputs, *, run_id, name=None, **kwargs):
+        if name in self.CHAIN_STAGES:
+            self._starts[run_id] = (name, time.perf_counter())
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        started = self._starts.pop(run_id, None)
+        if isinstance(started, tuple):
+            name, start = started
+            context = outputs.get("context", "") if isinstance(outputs, dict) else ""
+            record(self.CHAIN_STAGES[name], time.perf_counter() - start, context_characters=len(context) if isinstance(context, str) else 0)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._starts[run_id] = time.perf_counter()
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        start = self._starts.pop(run_id, None)
+        if start is None:
+            return
+
+        attributes = {}
+        generation = response.generations[0][0] if response.generations and response.generations[0] else None
+        usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+        if usage:
+            attributes["input_tokens"] = usage.get("input_tokens", 0)
+            attributes["output_tokens"] = usage.get("output_tokens", 0)
+        if generation is not None:
+            attributes["output_characters"] = len(generation.text)
+        record("generation", time.perf_counter() - start, **attributes)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._starts.pop(run_id, None)
+
+    on_retriever_error = on_chain_error
+    on_llm_error = on_chain_error
+
+# Shared by every RAG chain of the process
+tracing_callbacks = TracingCallbackHandler()
+
+def stage_summary():
+    """
+    Aggregates the spans in the ring buffer per stage: count, total, p50 and p95 wall time
+    and the sums of numeric attributes.
+    """
+    durations, totals = {}, {}
+    for span in list(spans):
+        durations.setdefault(span["stage"], []).append(span["duration"])
+        stage_totals = totals.setdefault(span["stage"], {})
+        for key, value in span.items():
+            # Booleans such as cache hits are counted as 0/1
+            if key not in ("duration", "timestamp") and isinstance(value, (int, float)):
+                stage_totals[key] = stage_totals.get(key, 0) + value
+
+    summary = {}
+    for stage, values in durations.items():
+        ordered = sorted(values)
+        summary[stage] = {
+            "count": len(ordered),
+            "total": sum(ordered),
+            "p50": ordered[len(ordered) // 2],
+            "p95": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+            "attributes": totals[stage],
+        }
+    return summary
+
+def export_json_lines():
+    """
+    Returns the spans in the ring buffer as JSON lines.
+    """
+    return "".join(json.dumps(span, default=str) + "\n" for span in list(spans))
+
+def export_prometheus():
+    """
+    Returns per-stage timings and attribute totals of the ring buffer in Prometheus text format.
+    """
+    summary = stage_summary()
+    lines = [
+        "# HELP ragify_stage_duration_seconds Wall time of recent RAG pipeline stages.",
+        "# TYPE ragify_stage_duration_seconds summary",
+    ]
+    for stage, values in summary.items():
+        lines.append(f'ragify_stage_duration_seconds{{stage="{stage}",quantile="0.5"}} {values["p50"]}')
+        lines.append(f'ragify_stage_duration_seconds{{stage="{stage}",quantile="0.95"}} {values["p95"]}')
+        lines.append(f'ragify_stage_duration_seconds_sum{{stage="{stage}"}} {values["total"]}')
+        lines.append(f'ragify_stage_duration_seconds_count{{stage="{stage}"}} {values["count"]}')
+
+    lines += [
+        "# HELP ragify_stage_attribute_total Sum of a numeric attribute over recent spans, such as chunks or tokens.",
+        "# TYPE ragify_stage_attribute_total gauge",
+    ]
+    for stage, values in summary.items():
+        for attribute, total in values["attributes"].items():
+            lines.append(f'ragify_stage_attribute_total{{stage="{stage}",attribute="{attribute}"}} {total}')
+    return "\n".join(lines) + "\n"
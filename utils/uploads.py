@@ -0,0 +1,106 @@
+import io
+import os
+import glob
+import time
+import hashlib
+import threading
+from contextlib import contextmanager
+from utils.constants import UPLOAD_SPILL_DIRECTORY, UPLOAD_SPILL_MAX_AGE
+
+class BufferStream(io.RawIOBase):
+    """
+    Seekable read-only binary stream over a bytes-like object, without copying it.
+    """
+
+    def __init__(self, buffer):
+        self.buffer = memoryview(buffer).cast("B")
+        self.position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, target):
+        size = min(len(target), len(self.buffer) - self.position)
+        target[:size] = self.buffer[self.position:self.position + size]
+        self.position += size
+        return size
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self.position, io.SEEK_END: len(self.buffer)}[whence]
+        self.position = max(0, base + offset)
+        return self.position
+
+    def tell(self):
+        return self.position
+
+@contextmanager
+def open_binary(file):
+    """
+    Yields a seekable binary stream for a path, a bytes-like buffer or a binary file object.
+    Only a stream opened from a path is closed afterwards.
+    """
+    if isinstance(file, (str, os.PathLike)):
+        with open(file, "rb") as f:
+            yield f
+    elif isinstance(file, (bytes, bytearray, memoryview)):
+        yield BufferStream(file)
+    else:
+        file.seek(0)
+        yield file
+
+def buffer_fingerprint(buffer):
+    """
+    Returns the sha256 of a bytes-like buffer, matching file_fingerprint of the same content.
+    """
+    return hashlib.sha256(buffer).hexdigest()
+
+# Reference counts of the spill files this process is using
+_spills = {}
+_spills_lock = threading.Lock()
+
+def acquire_spill(buffer, fingerprint, suffix=""):
+    """
+    Returns the path of a temporary file holding the buffer, for parsers that need a path
+    or run in another process. Files are named by content hash, so identical uploads share
+    one file and different uploads with the same name never collide. Pair with release_spill.
+    """
+    os.makedirs(UPLOAD_SPILL_DIRECTORY, exist_ok=True)
+    path = os.path.join(UPLOAD_SPILL_DIRECTORY, f"{fingerprint}{suffix}")
+    with _spills_lock:
+        if _spills.get(path, 0) == 0 and not os.path.exists(path):
+            temporary = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(temporary, "wb") as f:
+                f.write(buffer)
+            os.replace(temporary, path)
+        _spills[path] = _spills.get(path, 0) + 1
+    return path
+
+def release_spill(path):
+    """
+    Drops one reference to a spill file and deletes it once nobody uses it.
+    """
+    with _spills_lock:
+        _spills[path] -= 1
+        if _spills[path] > 0:
+            return
+        del _spills[path]
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+def sweep_spills(max_age=UPLOAD_SPILL_MAX_AGE):
+    """
+    Deletes spill files left behind by processes that exited without releasing them.
+    """
+    now = time.time()
+    with _spills_lock:
+        for path in glob.glob(os.path.join(UPLOAD_SPILL_DIRECTORY, "*")):
+            if path not in _spills and now - os.path.getmtime(path) > max_age:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass